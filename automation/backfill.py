@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Robert Hebert Media - Historical Report Backfill
+
+Usage:
+    python3 backfill.py --start 2025-01-06 --end 2025-12-28
+    python3 backfill.py --start 2025-01-01 --end 2025-12-31 --clients pfbhnc --monthly
+    python3 backfill.py --start 2025-01-06 --end 2025-12-28 --weekly --monthly --workers 8
+
+Fetches each client's whole span with one Google Ads query, splits it into
+weekly (and/or monthly) windows and publishes every report in parallel.
+No emails are sent. Heatmap and top-K sections need their own queries per
+window, so they are left out unless --breakdowns is given. A weekly span
+covers at most a year (weekly folder names have no year).
+"""
+
+import json
+import argparse
+
+from main import load_clients_config, run_backfill, select_clients, REPORT_WORKERS
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill Google Ads reports for past weeks/months')
+    parser.add_argument('--start', required=True, help='First day of the span (YYYY-MM-DD)')
+    parser.add_argument('--end', required=True, help='Last day of the span (YYYY-MM-DD)')
+    parser.add_argument('--clients', help='Comma-separated client slugs (default: all in clients.json)')
+    parser.add_argument('--weekly', action='store_true', help='Generate weekly reports (default)')
+    parser.add_argument('--monthly', action='store_true', help='Generate monthly reports')
+    parser.add_argument('--workers', type=int, default=REPORT_WORKERS, help='Parallel workers')
+    parser.add_argument('--breakdowns', action='store_true',
+                        help='Also fetch heatmap/top-K sections (extra queries per window)')
+    args = parser.parse_args()
+
+    granularities = []
+    if args.weekly or not args.monthly:
+        granularities.append('week')
+    if args.monthly:
+        granularities.append('month')
+
+    clients = select_clients(load_clients_config()['clients'], args.clients)
+    if not clients:
+        print("No matching clients. Exiting.")
+        return
+
+    try:
+        results = run_backfill(clients, args.start, args.end, granularities, args.workers,
+                               breakdowns=args.breakdowns)
+    except ValueError as e:
+        parser.error(str(e))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
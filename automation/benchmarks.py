@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+Robert Hebert Media - Report Pipeline Benchmarks
+
+Usage:
+    python3 benchmarks.py                   # Run all benchmarks
+    python3 benchmarks.py fetch             # Row aggregation throughput only
+    python3 benchmarks.py fetch --rows 500000
+    python3 benchmarks.py rollup            # Report breakdowns from one frame
+    python3 benchmarks.py heatmap           # Hourly rows (24x --rows), time and memory
+    python3 benchmarks.py topk              # Top 25 search terms, time and memory
+    python3 benchmarks.py imports           # `import main` time; exits 1 over budget
+
+Rows are synthetic GoogleAdsRow messages when the google-ads package is
+installed, and plain attribute objects otherwise.
+
+The imports benchmark fails (exit status 1) when `import main` loads one of
+HEAVY_MODULES or takes longer than --import-budget-ms, so it can gate
+deploys.
+"""
+
+import os
+import sys
+import enum
+import tempfile
+import time
+import random
+import argparse
+import importlib
+import itertools
+import subprocess
+import tracemalloc
+from datetime import datetime
+from types import SimpleNamespace
+
+import main
+from breakdowns import HEATMAP_METRICS, TERM_METRICS, HourlyHeatmap, TopK
+from metrics_store import date_span
+from reference_cache import ReferenceCache
+
+
+# ============================================================================
+# SYNTHETIC DATA
+# ============================================================================
+
+def load_row_type():
+    """Return the GoogleAdsRow proto-plus class, or None if unavailable."""
+    try:
+        from google.ads.googleads import client as ads_client_module
+        version = getattr(ads_client_module, '_DEFAULT_VERSION')
+        module = importlib.import_module(f'google.ads.googleads.{version}.services.types.google_ads_service')
+        return module.GoogleAdsRow
+    except Exception:
+        return None
+
+
+METRIC_FIELDS = ('impressions', 'clicks', 'cost_micros', 'conversions', 'conversions_value', 'all_conversions')
+
+# DeviceEnum values for MOBILE, TABLET and DESKTOP. Proto-plus enums are
+# IntEnums, so the fallback rows use one too.
+DEVICES = (2, 3, 4)
+DEVICE_NAMES = {2: 'MOBILE', 3: 'TABLET', 4: 'DESKTOP'}
+Device = enum.IntEnum('Device', {name: value for value, name in DEVICE_NAMES.items()})
+STATUS_NAMES = {2: 'ENABLED'}
+Status = enum.IntEnum('Status', {name: value for value, name in STATUS_NAMES.items()})
+RAW_ENUM_NAMES = {'status': STATUS_NAMES.get, 'device': DEVICE_NAMES.get}
+
+
+def make_rows(count, periods, campaigns=200, raw=False, with_names=None):
+    """
+    Build `count` campaign/date/device rows spread over the days in `periods`.
+    Like the campaign query, rows only carry campaign names and statuses
+    when the reference cache is off (`with_names` defaults to that).
+    """
+    if with_names is None:
+        with_names = not main.USE_REFERENCE_CACHE
+    dates = [date for period_start, period_end in periods for date in date_span(period_start, period_end)]
+
+    row_type = load_row_type()
+    rows = []
+    for i in range(count):
+        fields = {
+            'id': 1000 + i % campaigns,
+            'name': f'Campaign {i % campaigns}' if with_names else '',
+            'status': 2 if with_names else 0,
+            'date': dates[i % len(dates)],
+            'device': DEVICES[i % len(DEVICES)],
+            'impressions': 100 + i % 50,
+            'clicks': 5 + i % 7,
+            'cost_micros': 1_250_000 + i % 1000,
+            'conversions': (i % 3) * 0.5,
+            'conversions_value': (i % 3) * 40.0,
+            'all_conversions': (i % 3) * 0.5,
+        }
+        if row_type is not None:
+            row = row_type(
+                campaign={'id': fields['id'], 'name': fields['name'], 'status': fields['status']},
+                segments={'date': fields['date'], 'device': fields['device']},
+                metrics={k: fields[k] for k in METRIC_FIELDS},
+            )
+            rows.append(row_type.pb(row) if raw else row)
+        else:
+            status = fields['status'] if raw or not with_names else Status(fields['status'])
+            device = fields['device'] if raw else Device(fields['device'])
+            rows.append(SimpleNamespace(
+                campaign=SimpleNamespace(id=fields['id'], name=fields['name'], status=status),
+                segments=SimpleNamespace(date=fields['date'], device=device),
+                metrics=SimpleNamespace(**{k: fields[k] for k in METRIC_FIELDS}),
+            ))
+    return rows
+
+
+def make_campaign_rows(campaigns=200, raw=False):
+    """Build the campaign metadata rows the reference cache is filled from."""
+    return [
+        SimpleNamespace(campaign=SimpleNamespace(id=1000 + c, name=f'Campaign {c}',
+                                                 status=2 if raw else Status(2)))
+        for c in range(campaigns)
+    ]
+
+
+def use_benchmark_reference_cache():
+    """Point main at a reference cache in a fresh temp dir, not RHM_STATE_DIR."""
+    path = os.path.join(tempfile.mkdtemp(prefix='rhm-benchmarks-'), 'reference-cache.sqlite3')
+    main._reference_cache = ReferenceCache(path)
+
+
+def make_hourly_rows(periods, campaigns=200):
+    """
+    Build one campaign row per campaign, date and hour, as the campaign
+    query would return with hourly segments added (24x its usual rows).
+    """
+    dates = [date for period_start, period_end in periods for date in date_span(period_start, period_end)]
+    rows = []
+    for c in range(campaigns):
+        for date in dates:
+            day_of_week = datetime.strptime(date, '%Y-%m-%d').weekday() + 2
+            for hour in range(24):
+                i = len(rows)
+                rows.append(SimpleNamespace(
+                    campaign=SimpleNamespace(name=f'Campaign {c}', status=2),
+                    segments=SimpleNamespace(date=date, day_of_week=day_of_week, hour=hour),
+                    metrics=SimpleNamespace(impressions=4 + i % 5, clicks=i % 3, cost_micros=50_000 + i % 1000,
+                                            conversions=(i % 11 == 0) * 1.0),
+                ))
+    return rows
+
+
+def stream_rows(rows, count):
+    """Yield `count` rows by cycling through `rows`, like a long API stream."""
+    return itertools.islice(itertools.cycle(rows), count)
+
+
+def make_search_term_rows(count, distinct):
+    """
+    Build `count` search_term_view rows over up to `distinct` terms with a
+    long tail: a few terms get most rows and spend, most appear once or twice.
+    """
+    rng = random.Random(0)
+    rows = []
+    for _ in range(count):
+        term = int(distinct * rng.random() ** 4)
+        rows.append(SimpleNamespace(
+            search_term_view=SimpleNamespace(search_term=f'search term {term}'),
+            metrics=SimpleNamespace(impressions=10, clicks=1, cost_micros=1_000_000 // (term + 1) + rng.randrange(50),
+                                    conversions=(term % 7 == 0) * 1.0),
+        ))
+    return rows
+
+
+class FakeAccount:
+    """
+    CustomerAccount stand-in that serves prebuilt rows, and `campaign_rows`
+    for the campaign metadata query (the one without segments.date).
+    """
+
+    def __init__(self, rows, enum_names=None, campaign_rows=(), customer_id='1234567890'):
+        self.rows = rows
+        self.enum_names = enum_names
+        self.campaign_rows = campaign_rows
+        self.customer_id = customer_id
+
+    def search(self, query):
+        if 'FROM campaign' in query and 'segments.date' not in query:
+            return iter(self.campaign_rows)
+        return iter(self.rows)
+
+    def search_stream(self, query):
+        return iter(self.rows)
+
+
+def timed(fn, rows):
+    """Run fn and return rows/sec."""
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    return len(rows) / elapsed if elapsed else float('inf')
+
+
+# ============================================================================
+# BENCHMARKS
+# ============================================================================
+
+def bench_fetch(args):
+    """
+    Compare paged proto-plus aggregation with the streaming fast path, with
+    campaign names joined from a warm reference cache as in production.
+    """
+    periods = main.get_comparison_periods('2026-03-02', '2026-03-08', comparisons=1)
+    use_benchmark_reference_cache()
+
+    search_account = FakeAccount(make_rows(args.rows, periods, raw=False), None,
+                                 make_campaign_rows(raw=False), customer_id='1000000001')
+    stream_account = FakeAccount(make_rows(args.rows, periods, raw=True), RAW_ENUM_NAMES,
+                                 make_campaign_rows(raw=True), customer_id='1000000002')
+    for account in (search_account, stream_account):
+        if main.USE_REFERENCE_CACHE:
+            main.get_campaign_metadata(account)
+
+    before = timed(lambda: main.fetch_google_ads_periods(search_account, periods, mode='search'), search_account.rows)
+    after = timed(lambda: main.fetch_google_ads_periods(stream_account, periods, mode='stream'), stream_account.rows)
+
+    print(f"fetch aggregation ({args.rows:,} rows)")
+    print(f"  search + proto-plus : {before:>14,.0f} rows/sec")
+    print(f"  stream + raw proto  : {after:>14,.0f} rows/sec")
+    print(f"  speedup             : {after / before:>14.2f}x")
+
+
+def rollups_by_dict(records, groupings):
+    """Per-row dict accumulation of the same breakdowns, for comparison."""
+    results = {}
+    for grouping in groupings:
+        groups = {}
+        for record in records:
+            sums = groups.setdefault(tuple(record[d] for d in grouping), dict.fromkeys(METRIC_FIELDS, 0))
+            for metric in METRIC_FIELDS:
+                sums[metric] += record[metric]
+        results[grouping] = groups
+    return results
+
+
+def bench_rollup(args):
+    """Compare per-row dict rollups with the frame's bincount rollups."""
+    periods = main.get_comparison_periods('2026-03-02', '2026-03-08', comparisons=1)
+    use_benchmark_reference_cache()
+    rows = make_rows(args.rows, periods, raw=True)
+    frame = main.fetch_google_ads_frame(
+        FakeAccount(rows, RAW_ENUM_NAMES, make_campaign_rows(raw=True)), *periods[0], mode='stream'
+    )
+    records = list(frame.records())
+    groupings = [('campaign',), ('date',), ('device',), ('campaign', 'date'), ('campaign', 'device'), ()]
+
+    before = timed(lambda: rollups_by_dict(records, groupings), rows)
+    after = timed(lambda: frame.rollups(*groupings), rows)
+
+    print(f"rollups ({args.rows:,} rows, {len(groupings)} breakdowns)")
+    print(f"  per-row dicts       : {before:>14,.0f} rows/sec")
+    print(f"  frame bincount      : {after:>14,.0f} rows/sec")
+    print(f"  speedup             : {after / before:>14.2f}x")
+
+
+def heatmap_by_dict(rows):
+    """Per-row dict accumulation keyed like the segmented campaign rows."""
+    cells = {}
+    for row in rows:
+        segments = row.segments
+        key = (row.campaign.name, segments.date, segments.day_of_week, segments.hour)
+        sums = cells.setdefault(key, dict.fromkeys(HEATMAP_METRICS, 0))
+        for metric in HEATMAP_METRICS:
+            sums[metric] += getattr(row.metrics, metric)
+    return cells
+
+
+def peak_memory(fn):
+    """Run fn and return the peak memory it allocated, in MB."""
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1_000_000
+
+
+def bench_heatmap(args):
+    """Compare dict accumulation of hourly rows with the fixed 7 x 24 heatmap."""
+    periods = main.get_comparison_periods('2026-03-02', '2026-03-08', comparisons=1)[:1]
+    rows = make_hourly_rows(periods)
+    count = args.rows * 24
+
+    approaches = [
+        ('per-row dicts      ', lambda: heatmap_by_dict(stream_rows(rows, count))),
+        ('7 x 24 accumulator ', lambda: HourlyHeatmap().add_rows(stream_rows(rows, count))),
+    ]
+    print(f"hourly heatmap ({count:,} rows)")
+    speeds = []
+    for label, fn in approaches:
+        speeds.append(timed(fn, range(count)))
+        print(f"  {label} : {speeds[-1]:>14,.0f} rows/sec {peak_memory(fn):>10.1f} MB peak")
+    print(f"  speedup             : {speeds[1] / speeds[0]:>14.2f}x")
+
+
+def top_terms_by_dict(rows, k):
+    """Accumulate every term into a dict, then sort: exact but unbounded."""
+    terms = {}
+    for row in rows:
+        sums = terms.setdefault(row.search_term_view.search_term, dict.fromkeys(TERM_METRICS, 0))
+        for metric in TERM_METRICS:
+            sums[metric] += getattr(row.metrics, metric)
+    return sorted(terms.items(), key=lambda item: (-item[1]['cost_micros'], item[0]))[:k]
+
+
+def bench_topk(args):
+    """Compare dict accumulation of search terms with the streaming TopK."""
+    rows = make_search_term_rows(args.rows, distinct=args.rows // 2)
+    search_term = lambda row: row.search_term_view.search_term
+
+    exact = top_terms_by_dict(rows, 25)
+    top, _ = TopK(25).add_rows(rows, search_term).result()
+    matches = [row['term'] for row in top] == [term for term, _ in exact]
+
+    approaches = [
+        ('per-term dicts     ', lambda: top_terms_by_dict(rows, 25)),
+        ('streaming top-K    ', lambda: TopK(25).add_rows(rows, search_term).result()),
+    ]
+    print(f"top 25 search terms ({args.rows:,} rows, {len(set(map(search_term, rows))):,} distinct)")
+    speeds = []
+    for label, fn in approaches:
+        speeds.append(timed(fn, rows))
+        print(f"  {label} : {speeds[-1]:>14,.0f} rows/sec {peak_memory(fn):>10.1f} MB peak")
+    print(f"  speedup             : {speeds[1] / speeds[0]:>14.2f}x")
+    print(f"  same top 25         : {'yes' if matches else 'no'}")
+
+
+# SDKs main.py must only import on first use.
+HEAVY_MODULES = ('google.ads.googleads', 'google.cloud.secretmanager', 'sendgrid', 'yaml')
+
+
+def import_times(module):
+    """
+    Import `module` in a fresh interpreter under `python -X importtime`.
+    Returns [(depth, name, cumulative seconds)] in the order reported, where
+    depth 0 is a top-level import and each module follows its own imports.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, check=True
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((depth, name.strip(), int(cumulative) / 1_000_000))
+    return entries
+
+
+def eager_heavy_modules(entries):
+    """Return the HEAVY_MODULES that appear among the import_times entries."""
+    loaded = {name for _, name, _ in entries}
+    return [module for module in HEAVY_MODULES
+            if any(name == module or name.startswith(module + '.') for name in loaded)]
+
+
+def bench_imports(args):
+    """Time `import main` in a fresh interpreter and check no heavy SDK is loaded."""
+    runs = [import_times('main') for _ in range(args.import_runs)]
+    totals = [next(seconds for depth, name, seconds in entries if depth == 0 and name == 'main')
+              for entries in runs]
+    entries = runs[totals.index(min(totals))]
+
+    # main's direct imports are the depth-1 entries just before it.
+    end = next(i for i, (depth, name, _) in enumerate(entries) if depth == 0 and name == 'main')
+    start = max((i + 1 for i, (depth, _, _) in enumerate(entries[:end]) if depth == 0), default=0)
+    direct = sorted((entry for entry in entries[start:end] if entry[0] == 1), key=lambda entry: -entry[2])
+    heavy = eager_heavy_modules(entries)
+
+    print(f"import main (best of {args.import_runs})")
+    print(f"  total               : {min(totals) * 1000:>14.1f} ms (budget {args.import_budget_ms:,.0f} ms)")
+    for _, name, seconds in direct[:5]:
+        print(f"  {name:<20}: {seconds * 1000:>14.1f} ms")
+    if heavy:
+        print(f"  imported eagerly    : {', '.join(heavy)}")
+    ok = not heavy and min(totals) * 1000 <= args.import_budget_ms
+    print(f"  result              : {'ok' if ok else 'FAIL'}")
+    return ok
+
+
+BENCHMARKS = {
+    'fetch': bench_fetch,
+    'rollup': bench_rollup,
+    'heatmap': bench_heatmap,
+    'topk': bench_topk,
+    'imports': bench_imports,
+}
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='Benchmark the report pipeline')
+    parser.add_argument('names', nargs='*', help=f"Benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument('--rows', type=int, default=200_000, help='Synthetic rows per benchmark')
+    parser.add_argument('--import-budget-ms', type=float, default=500, help='Maximum `import main` time')
+    parser.add_argument('--import-runs', type=int, default=3, help='Fresh interpreters to time `import main` in')
+    args = parser.parse_args()
+
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark: {', '.join(unknown)}")
+
+    failed = False
+    for name in args.names or BENCHMARKS:
+        if BENCHMARKS[name](args) is False:
+            failed = True
+        print()
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main_cli())
@@ -0,0 +1,230 @@
+"""
+Robert Hebert Media - Streaming Breakdown Accumulators
+
+Report breakdowns whose source queries return far more rows than the report
+shows. Rows are folded into fixed-size accumulators while the API stream is
+read, so memory stays bounded by the accumulator, not by the account size.
+"""
+
+import heapq
+from array import array
+
+import numpy as np
+
+
+# ============================================================================
+# HOUR-OF-DAY x DAY-OF-WEEK HEATMAP
+# ============================================================================
+
+DAYS_OF_WEEK = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+HOURS_PER_DAY = 24
+
+# DayOfWeekEnum numbers MONDAY as 2 through SUNDAY as 8 (0/1 are
+# UNSPECIFIED/UNKNOWN and are skipped).
+MONDAY_ENUM_VALUE = 2
+
+HEATMAP_METRICS = ('impressions', 'clicks', 'cost_micros', 'conversions')
+
+# Rows buffered between folds into the grid; bounds the working memory.
+HEATMAP_CHUNK_ROWS = 16384
+
+
+class HourlyHeatmap:
+    """
+    7 x 24 grid of metrics by day of week and hour of day.
+
+    `sums` is preallocated as (metric, day, hour); rows are buffered in
+    small typed arrays and folded into it with one bincount per metric
+    every `chunk_rows` rows.
+    """
+
+    def __init__(self, chunk_rows=HEATMAP_CHUNK_ROWS):
+        self.chunk_rows = chunk_rows
+        self.sums = np.zeros((len(HEATMAP_METRICS), len(DAYS_OF_WEEK), HOURS_PER_DAY), dtype=np.float64)
+        self.rows = 0
+
+    def _fold(self, cells, columns):
+        """Add the buffered rows to the grid."""
+        if not cells:
+            return
+        index = np.array(cells, dtype=np.int64)
+        size = len(DAYS_OF_WEEK) * HOURS_PER_DAY
+        for i, values in enumerate(columns):
+            self.sums[i] += np.bincount(index, weights=np.array(values, dtype=np.float64),
+                                        minlength=size).reshape(len(DAYS_OF_WEEK), HOURS_PER_DAY)
+        self.rows += len(cells)
+
+    def add_rows(self, rows):
+        """Fold Google Ads rows with segments.day_of_week and segments.hour into the grid."""
+        cells = array('l')
+        columns = tuple(array('d') for _ in HEATMAP_METRICS)
+        add_cell = cells.append
+        add_impressions, add_clicks, add_cost, add_conversions = (column.append for column in columns)
+
+        for row in rows:
+            segments = row.segments
+            day = int(segments.day_of_week) - MONDAY_ENUM_VALUE
+            if not 0 <= day < len(DAYS_OF_WEEK):
+                continue
+            metrics = row.metrics
+            add_cell(day * HOURS_PER_DAY + int(segments.hour))
+            add_impressions(metrics.impressions)
+            add_clicks(metrics.clicks)
+            add_cost(metrics.cost_micros)
+            add_conversions(metrics.conversions)
+
+            if len(cells) >= self.chunk_rows:
+                self._fold(cells, columns)
+                del cells[:]
+                for column in columns:
+                    del column[:]
+
+        self._fold(cells, columns)
+        return self
+
+    def grid(self, metric):
+        """The 7 x 24 array for one metric (rows Monday..Sunday, columns hour 0..23)."""
+        return self.sums[HEATMAP_METRICS.index(metric)]
+
+    def total(self, metric):
+        return float(self.grid(metric).sum())
+
+    def peak(self, metric):
+        """(day name, hour) of the busiest cell for a metric, or None if it is all zero."""
+        grid = self.grid(metric)
+        if not grid.any():
+            return None
+        day, hour = np.unravel_index(int(grid.argmax()), grid.shape)
+        return DAYS_OF_WEEK[day], int(hour)
+
+
+# ============================================================================
+# TOP-K TERMS
+# ============================================================================
+
+TERM_METRICS = ('impressions', 'clicks', 'cost_micros', 'conversions')
+
+# Distinct terms tracked per top-K list, as a multiple of K.
+TOP_K_CAPACITY_FACTOR = 20
+
+# Metrics every top-terms breakdown is ranked by: spend and conversions.
+TERM_RANKINGS = ('cost_micros', 'conversions')
+
+
+def term_row(metrics):
+    """Add CTR, CPL and conversion rate to a dict of summed term metrics."""
+    row = dict(metrics)
+    row['ctr'] = metrics['clicks'] / metrics['impressions'] if metrics['impressions'] else 0.0
+    row['cpl'] = metrics['cost_micros'] / metrics['conversions'] if metrics['conversions'] else 0.0
+    row['conversion_rate'] = metrics['conversions'] / metrics['clicks'] if metrics['clicks'] else 0.0
+    return row
+
+
+class TopK:
+    """
+    Streaming top-K terms (keywords, search terms) by one metric, in
+    bounded memory.
+
+    At most `capacity` terms are tracked. When a new term arrives at a full
+    table, the tracked term with the lowest ranking weight is evicted into
+    the "other" bucket and the newcomer inherits that weight (Space-Saving),
+    so late arrivals are not starved. A min-heap finds the term to evict;
+    its weights are refreshed lazily, so adding to a tracked term is O(1).
+    Any term holding more than 1/capacity of the ranking metric is always
+    kept, and the result is exact whenever the stream has no more than
+    `capacity` distinct terms. Totals (top K + other) are always exact.
+    """
+
+    def __init__(self, k, rank_by='cost_micros', capacity=None):
+        self.k = k
+        self.rank = TERM_METRICS.index(rank_by)
+        self.capacity = max(k, capacity or k * TOP_K_CAPACITY_FACTOR)
+        # term -> [ranking weight, [metric sums]]
+        self.entries = {}
+        # (weight when pushed, term); a weight can be stale but never too high.
+        self.heap = []
+        self.other = [0.0] * len(TERM_METRICS)
+        # Evictions so far; while 0 the result is exact.
+        self.evicted = 0
+        self.rows = 0
+
+    def _evict(self):
+        """Move the lowest-weight tracked term into "other"; return its weight."""
+        while True:
+            weight, term = heapq.heappop(self.heap)
+            entry = self.entries[term]
+            if entry[0] > weight:
+                heapq.heappush(self.heap, (entry[0], term))
+                continue
+            del self.entries[term]
+            for i, value in enumerate(entry[1]):
+                self.other[i] += value
+            self.evicted += 1
+            return weight
+
+    def add(self, term, impressions, clicks, cost_micros, conversions):
+        """Add one row's metrics to a term."""
+        entry = self.entries.get(term)
+        if entry is None:
+            inherited = self._evict() if len(self.entries) >= self.capacity else 0.0
+            entry = self.entries[term] = [inherited, [0.0] * len(TERM_METRICS)]
+            heapq.heappush(self.heap, (inherited, term))
+
+        values = (impressions, clicks, cost_micros, conversions)
+        sums = entry[1]
+        for i, value in enumerate(values):
+            sums[i] += value
+        entry[0] += values[self.rank]
+        self.rows += 1
+
+    def add_rows(self, rows, term):
+        """Add Google Ads rows, keyed by `term(row)`."""
+        add = self.add
+        for row in rows:
+            metrics = row.metrics
+            add(term(row), metrics.impressions, metrics.clicks, metrics.cost_micros, metrics.conversions)
+        return self
+
+    def result(self):
+        """
+        Return (top, other): up to K term rows ranked by the metric (ties by
+        term), each with 'term', summed and derived metrics, and one "other"
+        row summing every remaining term.
+        """
+        ranked = sorted(self.entries.items(), key=lambda item: (-item[1][1][self.rank], str(item[0])))
+        other = list(self.other)
+        for _, (_, sums) in ranked[self.k:]:
+            for i, value in enumerate(sums):
+                other[i] += value
+
+        top = []
+        for term, (_, sums) in ranked[:self.k]:
+            row = term_row(dict(zip(TERM_METRICS, sums)))
+            row['term'] = term
+            top.append(row)
+        return top, term_row(dict(zip(TERM_METRICS, other)))
+
+
+class TermRankings:
+    """
+    One TopK per ranking metric (default TERM_RANKINGS), all fed from a
+    single pass over the rows, so one query yields both the top terms by
+    spend and by conversions.
+    """
+
+    def __init__(self, k, rankings=TERM_RANKINGS, capacity=None):
+        self.tops = {metric: TopK(k, metric, capacity) for metric in rankings}
+
+    def add_rows(self, rows, term):
+        """Add Google Ads rows, keyed by `term(row)`, to every ranking."""
+        adds = [top.add for top in self.tops.values()]
+        for row in rows:
+            metrics = row.metrics
+            key = term(row)
+            for add in adds:
+                add(key, metrics.impressions, metrics.clicks, metrics.cost_micros, metrics.conversions)
+        return self
+
+    def result(self):
+        """Return {ranking metric: (top, other)} (see TopK.result)."""
+        return {metric: top.result() for metric, top in self.tops.items()}
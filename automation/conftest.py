@@ -0,0 +1,9 @@
+"""
+Robert Hebert Media - Test Configuration
+
+test_connection.py is a manual check of live Google Ads credentials
+(python3 test_connection.py) and needs google-ads installed, so pytest
+does not collect it.
+"""
+
+collect_ignore = ['test_connection.py']
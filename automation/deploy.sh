@@ -10,11 +10,22 @@ PROJECT_ID="hendricks-ai-prod"
 REGION="us-central1"
 FUNCTION_NAME="rhm-google-ads-reports"
 SCHEDULER_NAME="rhm-weekly-reports"
+RESTATEMENT_SCHEDULER_NAME="rhm-weekly-restatement"
+WARMUP_SCHEDULER_NAME="rhm-weekly-warmup"
+TIMEOUT_SECONDS=540
 
 echo "=========================================="
 echo "Deploying Google Ads Report Automation"
 echo "=========================================="
 
+# Refuse to deploy if `import main` loads a heavy SDK eagerly or is over budget
+echo ""
+echo "Checking cold-start imports..."
+if ! python3 benchmarks.py imports; then
+    echo "Import check failed; not deploying."
+    exit 1
+fi
+
 # Check if logged in
 if ! gcloud auth list --filter=status:ACTIVE --format="value(account)" | head -n1 > /dev/null 2>&1; then
     echo "Please login to gcloud first: gcloud auth login"
@@ -74,6 +85,18 @@ fi
 echo ""
 echo "Deploying Cloud Function..."
 
+# The run ledger, metrics store, reference cache and publish manifest live
+# under RHM_STATE_DIR. Without it they sit in instance-local /tmp and a retry
+# on a fresh instance starts from nothing (see README, "State Between
+# Invocations"). Export RHM_STATE_DIR before running this script to pass
+# a shared mount through.
+ENV_VARS="GCP_PROJECT=$PROJECT_ID,FUNCTION_TIMEOUT_SECONDS=$TIMEOUT_SECONDS"
+if [ -n "$RHM_STATE_DIR" ]; then
+    ENV_VARS="$ENV_VARS,RHM_STATE_DIR=$RHM_STATE_DIR"
+else
+    echo "Warning: RHM_STATE_DIR is not set; run state is per instance and lost on cold starts"
+fi
+
 gcloud functions deploy $FUNCTION_NAME \
     --gen2 \
     --runtime python311 \
@@ -83,8 +106,8 @@ gcloud functions deploy $FUNCTION_NAME \
     --trigger-http \
     --allow-unauthenticated \
     --memory 512MB \
-    --timeout 540s \
-    --set-env-vars GCP_PROJECT=$PROJECT_ID
+    --timeout ${TIMEOUT_SECONDS}s \
+    --set-env-vars $ENV_VARS
 
 # Get the function URL
 FUNCTION_URL=$(gcloud functions describe $FUNCTION_NAME --region=$REGION --format='value(serviceConfig.uri)')
@@ -128,6 +151,30 @@ gcloud scheduler jobs create http $SCHEDULER_NAME \
     --http-method=POST \
     --oidc-service-account-email=$SERVICE_ACCOUNT
 
+# Restatement job - Thursday 8:00 AM CST, republishes reports whose
+# conversions Google Ads has restated since they were generated
+gcloud scheduler jobs delete $RESTATEMENT_SCHEDULER_NAME --location=$REGION --quiet 2>/dev/null || true
+
+gcloud scheduler jobs create http $RESTATEMENT_SCHEDULER_NAME \
+    --location=$REGION \
+    --schedule="0 8 * * 4" \
+    --time-zone="America/Chicago" \
+    --uri="$FUNCTION_URL?mode=restate" \
+    --http-method=POST \
+    --oidc-service-account-email=$SERVICE_ACCOUNT
+
+# Warm-up job - 7:55 AM CST before both runs, so they start on an instance
+# with secrets, the Google Ads channel and the publisher already set up
+gcloud scheduler jobs delete $WARMUP_SCHEDULER_NAME --location=$REGION --quiet 2>/dev/null || true
+
+gcloud scheduler jobs create http $WARMUP_SCHEDULER_NAME \
+    --location=$REGION \
+    --schedule="55 7 * * 1,4" \
+    --time-zone="America/Chicago" \
+    --uri="$FUNCTION_URL?mode=warmup" \
+    --http-method=POST \
+    --oidc-service-account-email=$SERVICE_ACCOUNT
+
 echo ""
 echo "=========================================="
 echo "DEPLOYMENT COMPLETE!"
@@ -135,6 +182,8 @@ echo "=========================================="
 echo ""
 echo "Cloud Function: $FUNCTION_URL"
 echo "Schedule: Every Monday at 8:00 AM CST"
+echo "Restatement: Every Thursday at 8:00 AM CST"
+echo "Warm-up: 7:55 AM CST before each run"
 echo ""
 echo "Next steps:"
 echo "1. Update clients.json with actual client data"
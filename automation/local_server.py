@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Robert Hebert Media - Local Function Server
+
+Usage:
+    python3 local_server.py                         # http://localhost:8080, 5 processes
+    python3 local_server.py --port 9000 --processes 9
+    curl -X POST "http://localhost:8080/?mode=coordinate&shards=4"
+
+Serves generate_weekly_reports over HTTP like the deployed Cloud Function.
+Each request runs in a pool of separate processes that stay warm between
+requests, standing in for function instances, so a coordinator run fans its
+shards out to real parallel workers offline. A coordinator occupies one
+process while it waits, so use more processes than shards.
+"""
+
+import sys
+import json
+import argparse
+import multiprocessing
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qsl
+
+
+class LocalRequest:
+    """The parts of a Flask request that generate_weekly_reports reads."""
+
+    def __init__(self, args, body, base_url):
+        self.args = args
+        self.body = body
+        self.base_url = base_url
+
+    def get_json(self, silent=False):
+        return self.body
+
+
+def run_request(args, body, base_url):
+    """Run the entry point in a pool process (imported once per process)."""
+    import main
+    return main.generate_weekly_reports(LocalRequest(args, body, base_url))
+
+
+def make_handler(pool, base_url):
+    class FunctionHandler(BaseHTTPRequestHandler):
+        def _invoke(self):
+            url = urlsplit(self.path)
+            length = int(self.headers.get('Content-Length') or 0)
+            try:
+                body = json.loads(self.rfile.read(length)) if length else None
+            except ValueError:
+                body = None
+
+            try:
+                result = pool.apply(run_request, (dict(parse_qsl(url.query)), body, base_url))
+                status = 200
+                # Like Flask, a (body, status) tuple sets the status code.
+                if isinstance(result, tuple):
+                    result, status = result
+            except Exception as e:
+                result = {'status': 'error', 'error': str(e)}
+                status = 500
+
+            payload = json.dumps(result).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        do_GET = _invoke
+        do_POST = _invoke
+
+    return FunctionHandler
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='Serve the report function locally')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--processes', type=int, default=5, help='Worker processes (stand-in instances)')
+    args = parser.parse_args()
+
+    base_url = f"http://{args.host}:{args.port}/"
+    # 'spawn' gives every process a fresh interpreter, like a new instance.
+    pool = multiprocessing.get_context('spawn').Pool(args.processes)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(pool, base_url))
+
+    print(f"Serving generate_weekly_reports at {base_url} with {args.processes} processes")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.terminate()
+
+
+if __name__ == '__main__':
+    sys.exit(main_cli())
@@ -5,15 +5,27 @@ Runs every Monday at 8:00 AM CST via Cloud Scheduler
 
 import os
 import json
-import base64
-import subprocess
+import itertools
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from google.cloud import secretmanager
-from google.ads.googleads.client import GoogleAdsClient
-from google.ads.googleads.errors import GoogleAdsException
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail, Attachment, FileContent, FileName, FileType
-import tempfile
+from html import escape
+import requests
+from metrics_frame import MetricsFrameBuilder, enum_name
+from breakdowns import DAYS_OF_WEEK, HourlyHeatmap, TermRankings
+from query_planner import build_query, plan_key, plan_queries
+from metrics_store import MetricsStore, changed_dates
+from reference_cache import SHARED, ReferenceCache
+from publisher import GitHubApiPublisher, GitWorkspacePublisher, PublishManifest, PublishQueue
+from run_ledger import RunLedger
+from scheduling import DEFAULT_CLIENT_SECONDS, Deadline, longest_first, predict_durations
+from rate_limiter import get_limiter, reset_usage, usage as quota_usage
+
+# The Secret Manager, Google Ads and SendGrid SDKs (and yaml) are imported
+# on first use, so a cold start only pays for the ones a request needs;
+# `python3 benchmarks.py imports` checks that `import main` stays light.
 
 
 # ============================================================================
@@ -24,7 +36,11 @@ PROJECT_ID = os.environ.get('GCP_PROJECT', 'hendricks-ai-prod')
 GITHUB_REPO = 'BLincoln711/robert-hebert-media-reports'
 REPORTS_DOMAIN = 'https://reports.roberthebertmedia.com'
 
-# Lead Gen Metrics to track
+# Secrets used by every run; fetched together at the start of a run
+REQUIRED_SECRETS = ['google-ads-credentials', 'github-token', 'sendgrid-api-key']
+SECRET_TTL_SECONDS = int(os.environ.get('SECRET_TTL_SECONDS', '3600'))
+
+# Lead Gen Metrics the campaign query may select
 METRICS = [
     'metrics.impressions',
     'metrics.clicks',
@@ -39,23 +55,148 @@ METRICS = [
 ]
 
 DIMENSIONS = [
+    'campaign.id',
     'campaign.name',
     'campaign.status',
     'segments.date',
     'segments.device',
 ]
 
+# GAQL sources report sections read from. key_fields are always selected
+# (the row grain each accumulator groups by); see query_planner.py.
+QUERY_SOURCES = {
+    'campaign': {
+        'resource': 'campaign',
+        'key_fields': ['campaign.id', 'segments.date'],
+        'where': ["campaign.status != 'REMOVED'"],
+        'order_by': 'metrics.cost_micros DESC',
+        'allowed': METRICS + DIMENSIONS,
+    },
+    # Without segments.date each weekday is summed across the span, so this
+    # returns at most campaigns x 7 x 24 rows.
+    'campaign_hourly': {
+        'resource': 'campaign',
+        'key_fields': ['segments.day_of_week', 'segments.hour'],
+        'where': ["campaign.status != 'REMOVED'"],
+    },
+    'keyword': {
+        'resource': 'keyword_view',
+        'key_fields': ['ad_group_criterion.keyword.text', 'ad_group_criterion.keyword.match_type'],
+        'where': ["campaign.status != 'REMOVED'", "ad_group_criterion.status != 'REMOVED'"],
+    },
+    'search_term': {
+        'resource': 'search_term_view',
+        'key_fields': ['search_term_view.search_term'],
+        'where': ["campaign.status != 'REMOVED'"],
+    },
+    # Cities as geo target constant resource names; their names come from
+    # the reference cache.
+    'location': {
+        'resource': 'geographic_view',
+        'key_fields': ['segments.geo_target_city'],
+        'where': ["campaign.status != 'REMOVED'"],
+    },
+}
+
+# Report sections and the fields each needs from its source. Sections on
+# the campaign source feed the shared metrics store, so they are enabled
+# for every client alike.
+REPORT_SECTIONS = {
+    # Key metrics, highlights, daily chart and campaign table; always on.
+    'summary': {
+        'source': 'campaign',
+        'fields': ['metrics.impressions', 'metrics.clicks', 'metrics.cost_micros', 'metrics.conversions',
+                   'metrics.conversions_value', 'metrics.all_conversions'],
+    },
+    # Campaign names and statuses in every row; only selected when
+    # USE_REFERENCE_CACHE is off, otherwise they are joined locally.
+    'campaign_names': {
+        'source': 'campaign',
+        'fields': ['campaign.name', 'campaign.status'],
+    },
+    'devices': {
+        'source': 'campaign',
+        'fields': ['segments.device', 'metrics.clicks', 'metrics.cost_micros', 'metrics.conversions'],
+    },
+    'heatmap': {
+        'source': 'campaign_hourly',
+        'fields': ['metrics.impressions', 'metrics.clicks', 'metrics.cost_micros', 'metrics.conversions'],
+    },
+    'keywords': {
+        'source': 'keyword',
+        'fields': ['metrics.impressions', 'metrics.clicks', 'metrics.cost_micros', 'metrics.conversions'],
+    },
+    'search_terms': {
+        'source': 'search_term',
+        'fields': ['metrics.impressions', 'metrics.clicks', 'metrics.cost_micros', 'metrics.conversions'],
+    },
+    'locations': {
+        'source': 'location',
+        'fields': ['metrics.impressions', 'metrics.clicks', 'metrics.cost_micros', 'metrics.conversions'],
+    },
+}
+
+# Sections left out of every report, e.g. DISABLED_SECTIONS=devices,heatmap.
+DISABLED_SECTIONS = {name.strip() for name in os.environ.get('DISABLED_SECTIONS', '').split(',') if name.strip()}
+
 
 # ============================================================================
 # HELPER FUNCTIONS
 # ============================================================================
 
+# Secrets are cached at module level so they survive across invocations on a
+# warm Cloud Functions instance.
+_secret_client = None
+_secret_cache = {}
+_secret_lock = threading.Lock()
+
+
+def get_secret_client():
+    """Return the shared Secret Manager client, creating it on first use."""
+    global _secret_client
+    if _secret_client is None:
+        with _secret_lock:
+            if _secret_client is None:
+                from google.cloud import secretmanager
+                _secret_client = secretmanager.SecretManagerServiceClient()
+    return _secret_client
+
+
 def get_secret(secret_name):
-    """Retrieve secret from Google Secret Manager."""
-    client = secretmanager.SecretManagerServiceClient()
+    """Retrieve secret from Google Secret Manager, cached for SECRET_TTL_SECONDS."""
+    cached = _secret_cache.get(secret_name)
+    if cached and cached[1] > time.monotonic():
+        return cached[0]
+
+    client = get_secret_client()
     name = f"projects/{PROJECT_ID}/secrets/{secret_name}/versions/latest"
-    response = client.access_secret_version(request={"name": name})
-    return response.payload.data.decode("UTF-8")
+    response = get_limiter('secret_manager').call(client.access_secret_version, request={"name": name})
+    value = response.payload.data.decode("UTF-8")
+
+    _secret_cache[secret_name] = (value, time.monotonic() + SECRET_TTL_SECONDS)
+    return value
+
+
+def prefetch_secrets(secret_names=REQUIRED_SECRETS):
+    """
+    Load all secrets in parallel so the client pipeline only hits the cache.
+
+    Failures are logged and left for the stage that needs the secret to
+    report, so one missing secret does not abort the whole run.
+    """
+    def fetch(secret_name):
+        try:
+            get_secret(secret_name)
+        except Exception as e:
+            print(f"Could not prefetch secret {secret_name}: {e}")
+
+    with ThreadPoolExecutor(max_workers=len(secret_names)) as pool:
+        list(pool.map(fetch, secret_names))
+
+
+def clear_secret_cache():
+    """Drop cached secrets, e.g. after rotating a credential."""
+    _secret_cache.clear()
 
 
 def load_clients_config():
@@ -65,9 +206,19 @@ def load_clients_config():
         return json.load(f)
 
 
-def get_date_range():
-    """Get the date range for the report (last 7 days)."""
-    today = datetime.now()
+def select_clients(clients, slugs=None):
+    """Filter clients to a comma-separated list (or iterable) of slugs."""
+    if not slugs:
+        return clients
+    if isinstance(slugs, str):
+        slugs = slugs.split(',')
+    wanted = {slug.strip() for slug in slugs}
+    return [client for client in clients if client['slug'] in wanted]
+
+
+def get_date_range(today=None):
+    """Get the date range for the report (last 7 days before `today`, default now)."""
+    today = today or datetime.now()
     # Find the most recent Sunday (end of report period)
     days_since_sunday = (today.weekday() + 1) % 7
     end_date = today - timedelta(days=days_since_sunday)
@@ -82,6 +233,59 @@ def get_date_range():
     }
 
 
+def get_month_range(year, month):
+    """Get the date range for a calendar month report."""
+    start_date = datetime(year, month, 1)
+    next_month = datetime(year + month // 12, month % 12 + 1, 1)
+    end_date = next_month - timedelta(days=1)
+
+    return {
+        'start_date': start_date.strftime('%Y-%m-%d'),
+        'end_date': end_date.strftime('%Y-%m-%d'),
+        'display_start': start_date.strftime('%B %d'),
+        'display_end': end_date.strftime('%d, %Y'),
+        'folder_name': f"{start_date.strftime('%b').lower()}{start_date.year}",
+        'period': 'Month'
+    }
+
+
+def get_report_windows(start_date, end_date, granularity='week'):
+    """
+    List (report range, comparison range) pairs for every complete week or
+    month between start_date and end_date ('YYYY-MM-DD').
+
+    Weeks follow get_date_range (Monday to Sunday); each window is compared
+    with the window immediately before it.
+    """
+    start = datetime.strptime(start_date, '%Y-%m-%d')
+    end = datetime.strptime(end_date, '%Y-%m-%d')
+    windows = []
+
+    if granularity == 'month':
+        year, month = start.year, start.month
+        if start.day != 1:
+            year, month = year + month // 12, month % 12 + 1
+        while True:
+            date_range = get_month_range(year, month)
+            if date_range['end_date'] > end_date:
+                break
+            prev_year, prev_month = (year, month - 1) if month > 1 else (year - 1, 12)
+            windows.append((date_range, get_month_range(prev_year, prev_month)))
+            year, month = year + month // 12, month % 12 + 1
+        return windows
+
+    # First Sunday on or after start that closes a full week inside the span
+    sunday = start + timedelta(days=(6 - start.weekday()))
+    if start.weekday() != 0:
+        sunday += timedelta(days=7)
+    while sunday <= end:
+        date_range = get_date_range(sunday + timedelta(days=1))
+        prev_range = get_date_range(sunday - timedelta(days=6))
+        windows.append((date_range, prev_range))
+        sunday += timedelta(days=7)
+    return windows
+
+
 def format_currency(micros):
     """Convert micros to dollars with formatting."""
     if micros is None:
@@ -114,146 +318,682 @@ def calculate_change(current, previous):
 # GOOGLE ADS API
 # ============================================================================
 
-def get_google_ads_client(client_config):
-    """Initialize Google Ads API client."""
-    # Get credentials from Secret Manager
-    google_ads_yaml = get_secret('google-ads-credentials')
+# One GoogleAdsClient and GoogleAdsService are shared by every client in a
+# run (and across runs on a warm instance), so the gRPC channel is built once
+# and the OAuth access token is only refreshed when it expires. Clients are
+# keyed by use_proto_plus: the streaming fetch decodes raw protobuf messages.
+_ads_clients = {}
+_ads_services = {}
+_ads_lock = threading.Lock()
 
-    # Write to temp file for GoogleAdsClient
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False) as f:
-        f.write(google_ads_yaml)
-        temp_path = f.name
+# 'stream' uses search_stream with raw protobuf rows; 'search' uses the paged
+# proto-plus search.
+ADS_FETCH_MODE = os.environ.get('ADS_FETCH_MODE', 'stream')
 
-    try:
-        client = GoogleAdsClient.load_from_storage(temp_path)
-        return client
-    finally:
-        os.unlink(temp_path)
+# 'client' fetches each client as it enters the pipeline; 'manager' finds
+# every child account under the manager (MCC) account and fetches all active
+# clients up front, concurrently over the shared channel.
+ADS_FETCH_SCOPE = os.environ.get('ADS_FETCH_SCOPE', 'client')
+MANAGER_FETCH_WORKERS = int(os.environ.get('MANAGER_FETCH_WORKERS', '16'))
 
+# Stored daily metrics are reused so only missing dates are fetched.
+USE_METRICS_STORE = os.environ.get('USE_METRICS_STORE', '1') == '1'
+_metrics_store = None
 
-def fetch_google_ads_data(client, customer_id, start_date, end_date):
-    """Fetch Google Ads performance data for the date range."""
-    ga_service = client.get_service("GoogleAdsService")
+# Adds the hour-of-day x day-of-week section, from one extra query per report.
+REPORT_HEATMAP = os.environ.get('REPORT_HEATMAP', '1') == '1'
 
-    query = f"""
-        SELECT
-            campaign.name,
-            campaign.status,
-            segments.date,
-            metrics.impressions,
-            metrics.clicks,
-            metrics.cost_micros,
-            metrics.conversions,
-            metrics.all_conversions,
-            metrics.ctr,
-            metrics.average_cpc
-        FROM campaign
-        WHERE segments.date BETWEEN '{start_date}' AND '{end_date}'
-            AND campaign.status != 'REMOVED'
-        ORDER BY metrics.cost_micros DESC
-    """
-
-    response = ga_service.search(customer_id=customer_id, query=query)
-
-    # Aggregate data
-    data = {
-        'campaigns': {},
-        'daily': {},
-        'totals': {
-            'impressions': 0,
-            'clicks': 0,
-            'cost_micros': 0,
-            'conversions': 0,
-            'all_conversions': 0,
+# Rows in each top keywords / search terms / locations table (one by spend,
+# one by conversions), for clients with "top_terms" / "locations" set.
+TOP_TERMS_LIMIT = int(os.environ.get('TOP_TERMS_LIMIT', '25'))
+
+# Campaign names/statuses and geo target names come from the reference
+# cache, so metrics queries select only ids and numbers.
+USE_REFERENCE_CACHE = os.environ.get('USE_REFERENCE_CACHE', '1') == '1'
+_reference_cache = None
+
+# Cached campaign metadata is trusted this long; after that a change_status
+# query decides whether it is refetched.
+REFERENCE_TTL_SECONDS = int(os.environ.get('REFERENCE_TTL_SECONDS', '86400'))
+
+# change_status only covers the last 90 days; older metadata is refetched.
+# A day of that is kept back for the gap between local and account time.
+CHANGE_STATUS_WINDOW_SECONDS = 89 * 86400
+
+# How far change_status checks reach back before the last check, since
+# change times are in the account's time zone.
+CHANGE_STATUS_MARGIN_SECONDS = 86400
+
+# Geo target constants almost never change; their cached names are dropped
+# and refetched this rarely.
+GEO_TARGET_TTL_SECONDS = int(os.environ.get('GEO_TARGET_TTL_SECONDS', str(30 * 86400)))
+
+
+class CustomerAccount:
+    """GoogleAdsService handle bound to one customer account."""
+
+    def __init__(self, ga_service, customer_id, enum_names=None):
+        self.ga_service = ga_service
+        self.customer_id = str(customer_id).replace('-', '')
+        self.enum_names = enum_names
+
+    def search(self, query):
+        """Run a paged GAQL search against this account."""
+        return self.ga_service.search(customer_id=self.customer_id, query=query)
+
+    def search_stream(self, query):
+        """Run a streaming GAQL search and yield rows across all batches."""
+        for batch in self.ga_service.search_stream(customer_id=self.customer_id, query=query):
+            yield from batch.results
+
+
+def get_google_ads_client(use_proto_plus=True):
+    """
+    Return the shared Google Ads API client.
+
+    Built in memory from the google-ads-credentials secret on first use;
+    all clients share one set of API credentials.
+    """
+    client = _ads_clients.get(use_proto_plus)
+    if client is None:
+        with _ads_lock:
+            client = _ads_clients.get(use_proto_plus)
+            if client is None:
+                import yaml
+                from google.ads.googleads.client import GoogleAdsClient
+                config = yaml.safe_load(get_secret('google-ads-credentials'))
+                config['use_proto_plus'] = use_proto_plus
+                client = GoogleAdsClient.load_from_dict(config)
+                _ads_clients[use_proto_plus] = client
+    return client
+
+
+def get_google_ads_service(use_proto_plus=True):
+    """Return the shared GoogleAdsService stub (thread-safe)."""
+    service = _ads_services.get(use_proto_plus)
+    if service is None:
+        client = get_google_ads_client(use_proto_plus=use_proto_plus)
+        with _ads_lock:
+            service = _ads_services.get(use_proto_plus)
+            if service is None:
+                service = client.get_service("GoogleAdsService")
+                _ads_services[use_proto_plus] = service
+    return service
+
+
+def get_customer_account(customer_id, use_proto_plus=True):
+    """Return a service handle for one customer account."""
+    enum_names = None
+    if not use_proto_plus:
+        # Raw protobuf rows carry enums as ints; name them when building frames.
+        enums = get_google_ads_client(use_proto_plus=False).enums
+        enum_names = {
+            'status': lambda value: enums.CampaignStatusEnum(value).name,
+            'device': lambda value: enums.DeviceEnum(value).name,
+            'match_type': lambda value: enums.KeywordMatchTypeEnum(value).name,
         }
-    }
+    return CustomerAccount(get_google_ads_service(use_proto_plus), customer_id, enum_names)
 
-    for row in response:
-        campaign_name = row.campaign.name
-        date = row.segments.date
-
-        # Campaign aggregation
-        if campaign_name not in data['campaigns']:
-            data['campaigns'][campaign_name] = {
-                'impressions': 0,
-                'clicks': 0,
-                'cost_micros': 0,
-                'conversions': 0,
-                'status': row.campaign.status.name,
-            }
 
-        data['campaigns'][campaign_name]['impressions'] += row.metrics.impressions
-        data['campaigns'][campaign_name]['clicks'] += row.metrics.clicks
-        data['campaigns'][campaign_name]['cost_micros'] += row.metrics.cost_micros
-        data['campaigns'][campaign_name]['conversions'] += row.metrics.conversions
-
-        # Daily aggregation
-        if date not in data['daily']:
-            data['daily'][date] = {
-                'impressions': 0,
-                'clicks': 0,
-                'cost_micros': 0,
-                'conversions': 0,
-            }
+def get_metrics_store():
+    """Return the shared daily metrics store, or None when USE_METRICS_STORE is off."""
+    global _metrics_store
+    if not USE_METRICS_STORE:
+        return None
+    if _metrics_store is None:
+        with _ads_lock:
+            if _metrics_store is None:
+                _metrics_store = MetricsStore(query_key=plan_key(campaign_query_plan()))
+    return _metrics_store
+
+
+def get_reference_cache():
+    """Return the shared reference data cache, or None when USE_REFERENCE_CACHE is off."""
+    global _reference_cache
+    if not USE_REFERENCE_CACHE:
+        return None
+    if _reference_cache is None:
+        with _ads_lock:
+            if _reference_cache is None:
+                _reference_cache = ReferenceCache()
+    return _reference_cache
+
+
+def reset_google_ads_client():
+    """Drop the shared clients, e.g. after the credentials secret changes."""
+    with _ads_lock:
+        _ads_clients.clear()
+        _ads_services.clear()
+
+
+def enabled_sections(client=None):
+    """
+    Report sections to fetch and render: the summary always, the others
+    unless listed in DISABLED_SECTIONS. Without a client, only the
+    sections every client shares (those on the campaign source).
+    """
+    sections = ['summary', 'devices']
+    required = {'summary'}
+    if not USE_REFERENCE_CACHE:
+        sections.append('campaign_names')
+        required.add('campaign_names')
+    if REPORT_HEATMAP:
+        sections.append('heatmap')
+    if client is not None and client.get('top_terms'):
+        sections += ['keywords', 'search_terms']
+    if client is not None and client.get('locations'):
+        sections.append('locations')
+    return [name for name in sections if name in required or name not in DISABLED_SECTIONS]
+
+
+def plan_report_queries(client=None):
+    """One query plan per source the client's enabled sections read."""
+    return plan_queries(REPORT_SECTIONS, enabled_sections(client), QUERY_SOURCES)
+
 
-        data['daily'][date]['impressions'] += row.metrics.impressions
-        data['daily'][date]['clicks'] += row.metrics.clicks
-        data['daily'][date]['cost_micros'] += row.metrics.cost_micros
-        data['daily'][date]['conversions'] += row.metrics.conversions
-
-        # Totals
-        data['totals']['impressions'] += row.metrics.impressions
-        data['totals']['clicks'] += row.metrics.clicks
-        data['totals']['cost_micros'] += row.metrics.cost_micros
-        data['totals']['conversions'] += row.metrics.conversions
-        data['totals']['all_conversions'] += row.metrics.all_conversions
-
-    # Calculate derived metrics
-    totals = data['totals']
-    if totals['clicks'] > 0:
-        totals['ctr'] = totals['clicks'] / totals['impressions'] if totals['impressions'] > 0 else 0
-        totals['cpc'] = totals['cost_micros'] / totals['clicks']
+def campaign_query_plan():
+    """The campaign source's plan, shared by every client and the metrics store."""
+    return plan_report_queries()['campaign']
+
+
+def build_campaign_query(start_date, end_date):
+    """Build the campaign performance GAQL query for a date span."""
+    return build_query(campaign_query_plan(), start_date, end_date)
+
+
+def run_report_query(account, query, mode, accumulate):
+    """
+    Run a GAQL query and return accumulate(rows).
+
+    Only the API call goes through the Google Ads limiter: it issues the
+    request and reads the first row, so errors opening the search or
+    stream are retried there. The rows are then accumulated outside the
+    limiter, once; a failure partway through the rows is raised rather
+    than re-running a half-consumed stream.
+    """
+    def open_rows():
+        rows = iter(account.search_stream(query) if mode == 'stream' else account.search(query))
+        first = next(rows, None)
+        return rows if first is None else itertools.chain((first,), rows)
+
+    return accumulate(get_limiter('google_ads').call(open_rows))
+
+
+def fetch_google_ads_frame(account, start_date, end_date, mode='search'):
+    """
+    Fetch campaign/date/device rows for the date range into a MetricsFrame.
+
+    mode='stream' uses search_stream and expects an account from
+    get_customer_account(..., use_proto_plus=False); 'search' uses the
+    paged proto-plus search.
+    """
+    def collect(rows):
+        builder = MetricsFrameBuilder()
+        builder.add_rows(rows)
+        return builder
+
+    builder = run_report_query(account, build_campaign_query(start_date, end_date), mode, collect)
+    campaigns = get_campaign_metadata(account, builder.campaign_keys()) if USE_REFERENCE_CACHE else None
+    return builder.build(account.enum_names, campaigns)
+
+
+def fetch_campaign_metadata(account):
+    """Return {campaign id: {'name', 'status'}} for the account's campaigns."""
+    status_name = (account.enum_names or {}).get('status', enum_name)
+    query = """
+        SELECT campaign.id, campaign.name, campaign.status
+        FROM campaign
+        WHERE campaign.status != 'REMOVED'
+    """
+    return run_report_query(account, query, 'search', lambda rows: {
+        str(row.campaign.id): {'name': row.campaign.name, 'status': status_name(row.campaign.status)}
+        for row in rows
+    })
+
+
+def campaigns_changed_since(account, seconds):
+    """
+    True if change_status records any campaign change in the last `seconds`
+    plus CHANGE_STATUS_MARGIN_SECONDS. Callers keep that within
+    CHANGE_STATUS_WINDOW_SECONDS; an older start date is rejected by the API.
+    """
+    now = datetime.now()
+    since = (now - timedelta(seconds=seconds + CHANGE_STATUS_MARGIN_SECONDS)).strftime('%Y-%m-%d %H:%M:%S')
+    until = (now + timedelta(days=1)).strftime('%Y-%m-%d %H:%M:%S')
+    query = f"""
+        SELECT change_status.resource_name
+        FROM change_status
+        WHERE change_status.resource_type = 'CAMPAIGN'
+            AND change_status.last_change_date_time BETWEEN '{since}' AND '{until}'
+        LIMIT 1
+    """
+    return run_report_query(account, query, 'search', lambda rows: any(True for _ in rows))
+
+
+def get_campaign_metadata(account, campaign_ids=()):
+    """
+    Return {campaign id: {'name', 'status'}} for an account from the
+    reference cache.
+
+    The cached campaigns are refetched when they have never been fetched,
+    are too old for change_status to cover (CHANGE_STATUS_WINDOW_SECONDS),
+    lack one of `campaign_ids` (e.g. a new campaign appeared in metrics
+    rows), or are older than REFERENCE_TTL_SECONDS and change_status
+    reports a campaign change since. An unchanged account only costs the
+    one-row change_status query per TTL.
+    """
+    cache = get_reference_cache()
+    if cache is None:
+        return fetch_campaign_metadata(account)
+
+    customer_id = account.customer_id
+    campaigns = cache.get(customer_id, 'campaign')
+    age = cache.age(customer_id, 'campaign')
+    missing = {str(campaign_id) for campaign_id in campaign_ids} - set(campaigns)
+
+    if age is None or age + CHANGE_STATUS_MARGIN_SECONDS > CHANGE_STATUS_WINDOW_SECONDS or missing:
+        refresh = True
+    elif age > REFERENCE_TTL_SECONDS:
+        refresh = campaigns_changed_since(account, age)
+        if not refresh:
+            cache.touch(customer_id, 'campaign')
     else:
-        totals['ctr'] = 0
-        totals['cpc'] = 0
+        refresh = False
+
+    if refresh:
+        campaigns = fetch_campaign_metadata(account)
+        cache.replace(customer_id, 'campaign', campaigns)
+    return campaigns
+
+
+def fetch_geo_target_names(account, resource_names):
+    """Return {geo target constant resource name: {'name'}} via GAQL on geo_target_constant."""
+    quoted = ', '.join(f"'{resource_name}'" for resource_name in resource_names)
+    query = f"""
+        SELECT geo_target_constant.resource_name, geo_target_constant.canonical_name
+        FROM geo_target_constant
+        WHERE geo_target_constant.resource_name IN ({quoted})
+    """
+    return run_report_query(account, query, 'search', lambda rows: {
+        row.geo_target_constant.resource_name: {'name': row.geo_target_constant.canonical_name.replace(',', ', ')}
+        for row in rows
+    })
 
-    if totals['conversions'] > 0:
-        totals['cpl'] = totals['cost_micros'] / totals['conversions']
-        totals['conversion_rate'] = totals['conversions'] / totals['clicks'] if totals['clicks'] > 0 else 0
+
+def get_geo_target_names(account, resource_names):
+    """
+    Return {resource name: display name} for geo target constants. They
+    are shared by every account; names missing from the reference cache
+    are fetched and added, and the whole kind is dropped after
+    GEO_TARGET_TTL_SECONDS.
+    """
+    resource_names = sorted({resource_name for resource_name in resource_names if resource_name})
+    if not resource_names:
+        return {}
+
+    cache = get_reference_cache()
+    if cache is None:
+        targets = fetch_geo_target_names(account, resource_names)
     else:
-        totals['cpl'] = 0
-        totals['conversion_rate'] = 0
+        age = cache.age(SHARED, 'geo_target')
+        if age is None or age > GEO_TARGET_TTL_SECONDS:
+            cache.replace(SHARED, 'geo_target', {})
+        targets = cache.get(SHARED, 'geo_target', resource_names)
+        missing = [resource_name for resource_name in resource_names if resource_name not in targets]
+        if missing:
+            fetched = fetch_geo_target_names(account, missing)
+            cache.update(SHARED, 'geo_target', fetched)
+            targets.update(fetched)
+    return {resource_name: target['name'] for resource_name, target in targets.items()}
+
+
+def fetch_hourly_heatmap(account, plan, start_date, end_date, mode='search'):
+    """Stream hour/weekday rows for the date range into an HourlyHeatmap."""
+    return run_report_query(
+        account, build_query(plan, start_date, end_date), mode,
+        lambda rows: HourlyHeatmap().add_rows(rows)
+    )
 
-    return data
 
+def fetch_top_keywords(account, plan, start_date, end_date, mode='search', limit=TOP_TERMS_LIMIT):
+    """
+    Stream keyword rows into TermRankings. Returns {ranking metric: (top
+    rows, other row)}; terms are (text, match type name).
+    """
+    match_type_name = (account.enum_names or {}).get('match_type', enum_name)
+
+    def keyword(row):
+        criterion = row.ad_group_criterion.keyword
+        return criterion.text, criterion.match_type
+
+    rankings = run_report_query(
+        account, build_query(plan, start_date, end_date), mode,
+        lambda rows: TermRankings(limit).add_rows(rows, keyword)
+    ).result()
+    for top, _ in rankings.values():
+        for row in top:
+            text, match_type = row['term']
+            row['term'] = (text, match_type_name(match_type))
+    return rankings
+
+
+def fetch_top_search_terms(account, plan, start_date, end_date, mode='search', limit=TOP_TERMS_LIMIT):
+    """Stream search term rows into TermRankings and return {ranking metric: (top, other)}."""
+    return run_report_query(
+        account, build_query(plan, start_date, end_date), mode,
+        lambda rows: TermRankings(limit).add_rows(rows, lambda row: row.search_term_view.search_term)
+    ).result()
+
+
+def fetch_top_locations(account, plan, start_date, end_date, mode='search', limit=TOP_TERMS_LIMIT):
+    """
+    Stream city rows into TermRankings and return {ranking metric: (top,
+    other)}, with geo target resource names replaced by their cached names.
+    """
+    rankings = run_report_query(
+        account, build_query(plan, start_date, end_date), mode,
+        lambda rows: TermRankings(limit).add_rows(rows, lambda row: row.segments.geo_target_city)
+    ).result()
+    names = get_geo_target_names(account, [row['term'] for top, _ in rankings.values() for row in top])
+    for top, _ in rankings.values():
+        for row in top:
+            row['term'] = names.get(row['term'], row['term'] or 'Unknown location')
+    return rankings
+
+
+# Section fetched from each non-campaign source, and how.
+BREAKDOWN_FETCHERS = {
+    'campaign_hourly': ('heatmap', fetch_hourly_heatmap),
+    'keyword': ('keywords', fetch_top_keywords),
+    'search_term': ('search_terms', fetch_top_search_terms),
+    'location': ('locations', fetch_top_locations),
+}
+
+
+def fetch_report_breakdowns(account, client, date_range, mode='search'):
+    """
+    Fetch the client's enabled sections beyond the campaign frame, one
+    query per planned source: {'heatmap', 'keywords', 'search_terms', 'locations'}.
+    """
+    breakdowns = {}
+    for source, plan in plan_report_queries(client).items():
+        if source in BREAKDOWN_FETCHERS:
+            section, fetch = BREAKDOWN_FETCHERS[source]
+            breakdowns[section] = fetch(account, plan, date_range['start_date'], date_range['end_date'], mode)
+    return breakdowns
+
+
+def get_comparison_periods(start_date, end_date, comparisons=1):
+    """
+    Return the report period followed by `comparisons` earlier periods.
 
-def fetch_previous_period_data(client, customer_id, start_date, end_date):
-    """Fetch previous period data for comparison."""
-    # Calculate previous period dates
+    Each period has the same length as the report period and ends the day
+    before the following one starts, e.g. comparisons=5 for week-over-week
+    plus the four weeks before that. Dates are (start, end) 'YYYY-MM-DD' tuples.
+    """
     start = datetime.strptime(start_date, '%Y-%m-%d')
     end = datetime.strptime(end_date, '%Y-%m-%d')
     period_length = (end - start).days + 1
 
-    prev_end = start - timedelta(days=1)
-    prev_start = prev_end - timedelta(days=period_length - 1)
+    periods = []
+    for i in range(comparisons + 1):
+        period_end = end - timedelta(days=period_length * i)
+        period_start = period_end - timedelta(days=period_length - 1)
+        periods.append((period_start.strftime('%Y-%m-%d'), period_end.strftime('%Y-%m-%d')))
+    return periods
+
+
+def fetch_google_ads_span(account, start_date, end_date, mode='search', store=None):
+    """
+    Fetch a date span, reading stored days from `store` when given.
+
+    Only the dates the store has not seen are queried (as one GAQL query
+    covering all gaps); the result is written back before the full span is
+    loaded from the store.
+    """
+    if store is None:
+        return fetch_google_ads_frame(account, start_date, end_date, mode)
+
+    gaps = store.missing_ranges(account.customer_id, start_date, end_date)
+    if gaps:
+        gap_start, gap_end = gaps[0][0], gaps[-1][1]
+        print(f"Fetching {account.customer_id} {gap_start} to {gap_end} from Google Ads")
+        frame = fetch_google_ads_frame(account, gap_start, gap_end, mode)
+        store.save_frame(account.customer_id, frame, gap_start, gap_end)
+
+    return store.load_frame(account.customer_id, start_date, end_date)
+
+
+def fetch_google_ads_periods(account, periods, mode='search', store=None):
+    """
+    Fetch several contiguous periods with a single GAQL query.
+
+    Queries the whole span covered by `periods` once and splits the rows by
+    `segments.date`. Returns one MetricsFrame per period, in the order given.
+    """
+    span_start = min(period_start for period_start, _ in periods)
+    span_end = max(period_end for _, period_end in periods)
 
-    return fetch_google_ads_data(
-        client,
-        customer_id,
-        prev_start.strftime('%Y-%m-%d'),
-        prev_end.strftime('%Y-%m-%d')
+    frame = fetch_google_ads_span(account, span_start, span_end, mode, store)
+    return [frame.select_dates(period_start, period_end) for period_start, period_end in periods]
+
+
+def fetch_current_and_previous(account, start_date, end_date, mode='search', store=None):
+    """Fetch the report period and the period before it in one query."""
+    current_data, prev_data = fetch_google_ads_periods(
+        account,
+        get_comparison_periods(start_date, end_date, comparisons=1),
+        mode,
+        store
     )
+    return current_data, prev_data
+
+
+def get_manager_customer_id():
+    """The manager account: MANAGER_CUSTOMER_ID, else the credentials' login_customer_id."""
+    manager_id = os.environ.get('MANAGER_CUSTOMER_ID') or get_google_ads_client().login_customer_id
+    if not manager_id:
+        raise RuntimeError('Manager fetch needs MANAGER_CUSTOMER_ID or login_customer_id in the credentials')
+    return str(manager_id).replace('-', '')
+
+
+def discover_child_accounts(manager_id):
+    """Return {customer_id: descriptive name} for enabled non-manager accounts under a manager."""
+    account = get_customer_account(manager_id)
+    query = """
+        SELECT
+            customer_client.id,
+            customer_client.descriptive_name
+        FROM customer_client
+        WHERE customer_client.manager = FALSE
+            AND customer_client.status = 'ENABLED'
+    """
+
+    return run_report_query(account, query, 'search', lambda rows: {
+        str(row.customer_client.id): row.customer_client.descriptive_name
+        for row in rows
+    })
+
+
+def fetch_manager_frames(customer_ids, start_date, end_date, mode='search', store=None,
+                         workers=MANAGER_FETCH_WORKERS, deadline=None, predictions=None):
+    """
+    Fetch a date span for many customer accounts concurrently.
+
+    Every search shares the one GoogleAdsService channel. Returns
+    {customer_id: (MetricsFrame or the exception that account raised,
+    seconds its fetch took)}. With a `deadline`, accounts start in the
+    given order only while their predicted seconds (`predictions`, default
+    DEFAULT_CLIENT_SECONDS) still fit; after the first that does not, no
+    more are started and the rest are left out of the result.
+    """
+    predictions = predictions or {}
+    stopped = threading.Event()
+
+    def fetch(customer_id):
+        if stopped.is_set():
+            return None
+        if deadline is not None and not deadline.can_start(predictions.get(customer_id, DEFAULT_CLIENT_SECONDS)):
+            stopped.set()
+            return None
+
+        started = time.monotonic()
+        try:
+            account = get_customer_account(customer_id, use_proto_plus=mode != 'stream')
+            frame = fetch_google_ads_span(account, start_date, end_date, mode, store)
+        except Exception as e:
+            print(f"Error fetching {customer_id}: {e}")
+            frame = e
+        return frame, time.monotonic() - started
+
+    if not customer_ids:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(customer_ids))) as pool:
+        futures = {customer_id: pool.submit(fetch, customer_id) for customer_id in customer_ids}
+
+    frames = {customer_id: future.result() for customer_id, future in futures.items()}
+    skipped = [customer_id for customer_id, fetched in frames.items() if fetched is None]
+    if skipped:
+        print(f"Deadline reached: left {len(skipped)} of {len(customer_ids)} accounts out of the manager batch")
+    return {customer_id: fetched for customer_id, fetched in frames.items() if fetched is not None}
 
 
 # ============================================================================
 # REPORT GENERATION
 # ============================================================================
 
-def generate_html_report(client_name, data, prev_data, date_range):
-    """Generate branded HTML report."""
+def format_hour(hour, compact=False):
+    """12-hour clock label for an hour of day: '3 PM', or '3p' when compact."""
+    label = f"{hour % 12 or 12}{'a' if hour < 12 else 'p'}"
+    return label if compact else f"{label[:-1]} {label[-1].upper()}M"
+
+
+def render_heatmap_section(heatmap):
+    """
+    HTML section shading each weekday/hour cell by conversions (clicks for
+    accounts with no conversions); empty when there is no heatmap data.
+    """
+    if heatmap is None or heatmap.total('clicks') == 0:
+        return ""
+
+    metric = 'conversions' if heatmap.total('conversions') else 'clicks'
+    grid = heatmap.grid(metric)
+    busiest = grid.max()
+    peak_day, peak_hour = heatmap.peak(metric)
+
+    header = ''.join(f'<th>{format_hour(hour, compact=True)}</th>' for hour in range(24))
+    rows = ""
+    for day, day_name in enumerate(DAYS_OF_WEEK):
+        cells = ''.join(
+            f'<td title="{day_name} {format_hour(hour)}: {value:.1f} {metric}" '
+            f'style="background: rgba(0, 212, 255, {value / busiest:.2f});"></td>'
+            for hour, value in enumerate(grid[day].tolist())
+        )
+        rows += f"""
+                    <tr><th>{day_name[:3]}</th>{cells}</tr>"""
+
+    return f"""
+        <!-- Hour x Day Heatmap -->
+        <div class="section">
+            <h2 class="section-title">🕐 When {metric.title()} Come In</h2>
+            <p>
+                Darker cells had more {metric}. Busiest hour:
+                <strong>{peak_day} {format_hour(peak_hour)}</strong> ({busiest:.1f} {metric}).
+            </p>
+            <table class="heatmap">
+                <thead>
+                    <tr><th></th>{header}</tr>
+                </thead>
+                <tbody>{rows}
+                </tbody>
+            </table>
+        </div>
+"""
 
-    totals = data['totals']
-    prev_totals = prev_data['totals']
+
+def render_top_terms_table(title, term_label, terms, show_match_type=False):
+    """
+    HTML table of ranked top terms with an "all other" row; empty when
+    there were no terms. `terms` is a TopK (top rows, other row) pair.
+    """
+    if terms is None or not terms[0]:
+        return ""
+    top, other = terms
+
+    def metric_cells(metrics):
+        return f"""
+                <td>{format_currency(metrics['cost_micros'])}</td>
+                <td>{format_number(metrics['clicks'])}</td>
+                <td>{metrics['conversions']:.1f}</td>
+                <td>{format_currency(metrics['cpl'])}</td>"""
+
+    rows = ""
+    for metrics in top:
+        if show_match_type:
+            text, match_type = metrics['term']
+            term_cells = (f'<td style="font-weight: 600;">{escape(text)}</td>'
+                          f'<td>{escape(str(match_type).replace("_", " ").title())}</td>')
+        else:
+            term_cells = f'<td style="font-weight: 600;">{escape(metrics["term"])}</td>'
+        rows += f"""
+            <tr>
+                {term_cells}{metric_cells(metrics)}
+            </tr>
+        """
+    if other['impressions'] or other['cost_micros']:
+        rows += f"""
+            <tr style="color: #888;">
+                <td{' colspan="2"' if show_match_type else ''}><em>All other {term_label}s</em></td>{metric_cells(other)}
+            </tr>
+        """
+
+    return f"""
+        <div class="section">
+            <h2 class="section-title">{title}</h2>
+            <table>
+                <thead>
+                    <tr>
+                        <th>{term_label.title()}</th>{'<th>Match</th>' if show_match_type else ''}
+                        <th>Spend</th>
+                        <th>Clicks</th>
+                        <th>Conversions</th>
+                        <th>Cost/Lead</th>
+                    </tr>
+                </thead>
+                <tbody>
+                    {rows}
+                </tbody>
+            </table>
+        </div>
+"""
+
+
+def render_top_terms_section(title, term_label, rankings, show_match_type=False):
+    """
+    The top terms by spend and, when any term converted, by conversions.
+    `rankings` is a TermRankings result ({ranking metric: (top, other)}).
+    """
+    if not rankings:
+        return ""
+    html = render_top_terms_table(f"{title} by Spend", term_label, rankings.get('cost_micros'), show_match_type)
+    by_conversions = rankings.get('conversions')
+    if by_conversions and any(row['conversions'] for row in by_conversions[0]):
+        html += render_top_terms_table(f"{title} by Conversions", term_label, by_conversions, show_match_type)
+    return html
+
+
+def generate_html_report(client_name, data, prev_data, date_range, breakdowns=None, sections=None):
+    """
+    Generate branded HTML report from current and previous MetricsFrames,
+    plus the optional sections in `breakdowns` (see fetch_report_breakdowns).
+    `sections` lists the enabled report sections (default: all).
+    """
+    breakdowns = breakdowns or {}
+    show_devices = sections is None or 'devices' in sections
+
+    totals = data.totals()
+    prev_totals = prev_data.totals()
 
     # Calculate week-over-week changes
     changes = {
@@ -266,30 +1006,74 @@ def generate_html_report(client_name, data, prev_data, date_range):
     }
 
     # Generate daily chart data
-    daily_labels = sorted(data['daily'].keys())
-    daily_conversions = [data['daily'][d]['conversions'] for d in daily_labels]
-    daily_spend = [data['daily'][d]['cost_micros'] / 1_000_000 for d in daily_labels]
+    daily = data.by_date()
+    daily_labels = list(daily)
+    daily_conversions = [daily[d]['conversions'] for d in daily_labels]
+    daily_spend = [daily[d]['cost_micros'] / 1_000_000 for d in daily_labels]
 
     # Format daily labels for display
     daily_labels_display = [datetime.strptime(d, '%Y-%m-%d').strftime('%a %m/%d') for d in daily_labels]
 
     # Generate campaign table rows
     campaign_rows = ""
-    for name, metrics in sorted(data['campaigns'].items(), key=lambda x: x[1]['cost_micros'], reverse=True):
-        cpl = metrics['cost_micros'] / metrics['conversions'] if metrics['conversions'] > 0 else 0
-        cvr = (metrics['conversions'] / metrics['clicks'] * 100) if metrics['clicks'] > 0 else 0
+    for metrics in data.by_campaign():
         campaign_rows += f"""
             <tr>
-                <td style="font-weight: 600;">{name}</td>
+                <td style="font-weight: 600;">{metrics['name']}</td>
                 <td>{format_currency(metrics['cost_micros'])}</td>
                 <td>{format_number(metrics['impressions'])}</td>
                 <td>{format_number(metrics['clicks'])}</td>
                 <td>{metrics['conversions']:.1f}</td>
-                <td>{format_currency(cpl)}</td>
-                <td>{cvr:.1f}%</td>
+                <td>{format_currency(metrics['cpl'])}</td>
+                <td>{metrics['conversion_rate'] * 100:.1f}%</td>
+            </tr>
+        """
+
+    # Generate device table rows (omitted when rows carry no device)
+    device_rows = ""
+    for metrics in data.by_device() if show_devices else []:
+        if not metrics['device']:
+            continue
+        device_rows += f"""
+            <tr>
+                <td style="font-weight: 600;">{str(metrics['device']).replace('_', ' ').title()}</td>
+                <td>{format_currency(metrics['cost_micros'])}</td>
+                <td>{format_number(metrics['clicks'])}</td>
+                <td>{metrics['conversions']:.1f}</td>
+                <td>{format_currency(metrics['cpl'])}</td>
+                <td>{metrics['conversion_rate'] * 100:.1f}%</td>
             </tr>
         """
 
+    device_section = f"""
+        <!-- Device Performance -->
+        <div class="section">
+            <h2 class="section-title">📱 Device Performance</h2>
+            <table>
+                <thead>
+                    <tr>
+                        <th>Device</th>
+                        <th>Spend</th>
+                        <th>Clicks</th>
+                        <th>Conversions</th>
+                        <th>Cost/Lead</th>
+                        <th>CVR</th>
+                    </tr>
+                </thead>
+                <tbody>
+                    {device_rows}
+                </tbody>
+            </table>
+        </div>
+""" if device_rows else ""
+
+    heatmap_section = render_heatmap_section(breakdowns.get('heatmap'))
+    top_terms_section = (
+        render_top_terms_section('🔑 Top Keywords', 'keyword', breakdowns.get('keywords'), show_match_type=True)
+        + render_top_terms_section('🔍 Top Search Terms', 'search term', breakdowns.get('search_terms'))
+        + render_top_terms_section('📍 Top Locations', 'location', breakdowns.get('locations'))
+    )
+
     def change_indicator(change, invert=False):
         """Generate change indicator HTML. Invert for metrics where down is good (like CPL)."""
         if change == 0:
@@ -304,7 +1088,7 @@ def generate_html_report(client_name, data, prev_data, date_range):
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Google Ads Report - {client_name} - Week of {date_range['display_start']}</title>
+    <title>Google Ads Report - {client_name} - {date_range.get('period', 'Week')} of {date_range['display_start']}</title>
     <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
     <style>
         * {{
@@ -461,6 +1245,13 @@ def generate_html_report(client_name, data, prev_data, date_range):
             text-decoration: none;
         }}
 
+        .heatmap th, .heatmap td {{
+            padding: 6px 2px;
+            text-align: center;
+            font-size: 0.7rem;
+            border: 1px solid #0f0f0f;
+        }}
+
         .badge {{
             display: inline-block;
             background: linear-gradient(135deg, #00d4ff, #0088cc);
@@ -495,7 +1286,7 @@ def generate_html_report(client_name, data, prev_data, date_range):
     <header class="header">
         <h1>📊 Google Ads Performance Report</h1>
         <p class="subtitle">{client_name}</p>
-        <p class="date-range">Week of {date_range['display_start']} - {date_range['display_end']}</p>
+        <p class="date-range">{date_range.get('period', 'Week')} of {date_range['display_start']} - {date_range['display_end']}</p>
     </header>
 
     <div class="container">
@@ -572,10 +1363,10 @@ def generate_html_report(client_name, data, prev_data, date_range):
                 </tbody>
             </table>
         </div>
-    </div>
+{device_section}{heatmap_section}{top_terms_section}    </div>
 
     <footer class="footer">
-        <p>Report generated on {datetime.now().strftime('%B %d, %Y at %I:%M %p')}</p>
+        <p>Data through {datetime.strptime(date_range['end_date'], '%Y-%m-%d').strftime('%B %d, %Y')}</p>
         <p style="margin-top: 8px;">Powered by <a href="https://roberthebertmedia.com">Robert Hebert Media</a></p>
     </footer>
 
@@ -704,6 +1495,9 @@ def send_email_notification(client_config, report_url, date_range):
     </div>
     """
 
+    from sendgrid import SendGridAPIClient
+    from sendgrid.helpers.mail import Mail
+
     message = Mail(
         from_email='reports@roberthebertmedia.com',
         to_emails=client_config['email'],
@@ -723,7 +1517,7 @@ def send_email_notification(client_config, report_url, date_range):
 
     try:
         sg = SendGridAPIClient(sendgrid_api_key)
-        response = sg.send(message)
+        response = get_limiter('sendgrid').call(sg.send, message)
         print(f"Email sent to {client_config['email']}: {response.status_code}")
         return True
     except Exception as e:
@@ -735,39 +1529,886 @@ def send_email_notification(client_config, report_url, date_range):
 # GITHUB DEPLOYMENT
 # ============================================================================
 
-def deploy_to_github(client_slug, html_content, date_range):
-    """Deploy report to GitHub Pages."""
-    github_token = get_secret('github-token')
+# 'api' publishes through the GitHub Git Data API; 'git' pushes from a
+# persistent local clone. Either way the publisher is kept between runs on a
+# warm instance.
+PUBLISH_BACKEND = os.environ.get('PUBLISH_BACKEND', 'api')
+# Skip files whose content hash matches what was last published.
+PUBLISH_SKIP_UNCHANGED = os.environ.get('PUBLISH_SKIP_UNCHANGED', '1') == '1'
+_publisher = None
+_publish_queue = None
+_publisher_lock = threading.Lock()
+
+
+def get_publisher():
+    """Return the shared report publisher."""
+    global _publisher
+    if _publisher is None:
+        with _publisher_lock:
+            if _publisher is None:
+                token = lambda: get_secret('github-token')
+                manifest = PublishManifest() if PUBLISH_SKIP_UNCHANGED else None
+                if PUBLISH_BACKEND == 'git':
+                    _publisher = GitWorkspacePublisher(GITHUB_REPO, token, manifest=manifest)
+                else:
+                    _publisher = GitHubApiPublisher(GITHUB_REPO, token, manifest=manifest)
+    return _publisher
+
+
+def get_publish_queue():
+    """
+    Return the shared publish queue. Runs on the same instance that finish
+    within the queue window are merged into one commit.
+    """
+    global _publish_queue
+    if _publish_queue is None:
+        publisher = get_publisher()
+        with _publisher_lock:
+            if _publish_queue is None:
+                _publish_queue = PublishQueue(publisher)
+    return _publish_queue
+
+
+def new_publish_batch(label):
+    """Start collecting the files a run will publish."""
+    return {'run_id': f"{label}-{uuid.uuid4().hex[:8]}", 'files': {}}
 
+
+def stage_report(client_slug, html_content, date_range, batch):
+    """Add a report to the run's publish batch and return its URL."""
     folder_name = f"{client_slug}-{date_range['folder_name']}"
+    batch['files'][f"{folder_name}/index.html"] = html_content
+    return f"{REPORTS_DOMAIN}/{folder_name}/"
 
-    # Create temporary directory and file
-    import tempfile
-    import shutil
 
-    with tempfile.TemporaryDirectory() as tmpdir:
-        # Clone repo
-        repo_url = f"https://{github_token}@github.com/{GITHUB_REPO}.git"
-        subprocess.run(['git', 'clone', '--depth', '1', repo_url, tmpdir], check=True)
+def publish_reports(batch, message):
+    """
+    Publish a run's batch through the queue and wait for it to land.
+    Returns the paths that landed.
+    """
+    outcome = get_publish_queue().submit(batch['run_id'], batch['files'], message).result()
+    print(f"Published {len(outcome['landed'])} files for {outcome['run_id']} "
+          f"({len(outcome['unchanged'])} unchanged)")
+    return outcome['landed']
 
-        # Create report directory
-        report_dir = os.path.join(tmpdir, folder_name)
-        os.makedirs(report_dir, exist_ok=True)
 
-        # Write report
-        report_path = os.path.join(report_dir, 'index.html')
-        with open(report_path, 'w') as f:
-            f.write(html_content)
+def publish_staged(results, message, batch):
+    """
+    Publish everything staged during a run. If the push fails, successful
+    results are marked as errors since their reports never went live.
+    """
+    try:
+        publish_reports(batch, message)
+        return True
+    except Exception as e:
+        print(f"Error publishing reports: {e}")
+        for result in results:
+            if result['status'] == 'success' and not result.get('resumed'):
+                result['status'] = 'error'
+                result['error'] = f"Publish failed: {e}"
+                result.pop('url', None)
+        return False
 
-        # Git commit and push
-        os.chdir(tmpdir)
-        subprocess.run(['git', 'config', 'user.email', 'reports@roberthebertmedia.com'], check=True)
-        subprocess.run(['git', 'config', 'user.name', 'RHM Report Bot'], check=True)
-        subprocess.run(['git', 'add', '-A'], check=True)
-        subprocess.run(['git', 'commit', '-m', f'Add {client_slug} report for {date_range["folder_name"]}'], check=True)
-        subprocess.run(['git', 'push'], check=True)
 
-    return f"{REPORTS_DOMAIN}/{folder_name}/"
+def deploy_to_github(client_slug, html_content, date_range):
+    """Deploy a single report to GitHub Pages."""
+    batch = new_publish_batch(f"deploy-{client_slug}")
+    report_url = stage_report(client_slug, html_content, date_range, batch)
+    publish_reports(batch, f'Add {client_slug} report for {date_range["folder_name"]}')
+    return report_url
+
+
+# ============================================================================
+# CLIENT PIPELINE
+# ============================================================================
+
+# Number of clients processed concurrently. 1 keeps the original sequential run.
+REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', '4'))
+
+# Clients allowed in each pipeline stage at once (never more than the run's
+# workers). Fetches mostly wait on the API, so they overlap the most;
+# rendering is CPU-bound under the GIL, publishing stages into the run's one
+# shared batch, and notifying is paced by SendGrid.
+STAGE_LIMITS = {
+    'fetch': int(os.environ.get('FETCH_STAGE_LIMIT', str(REPORT_WORKERS))),
+    'render': int(os.environ.get('RENDER_STAGE_LIMIT', '1')),
+    'publish': int(os.environ.get('PUBLISH_STAGE_LIMIT', '1')),
+    'notify': int(os.environ.get('NOTIFY_STAGE_LIMIT', '2')),
+}
+
+# Follow-up invocations a run may chain for clients it had to defer.
+MAX_HANDOFFS = int(os.environ.get('MAX_HANDOFFS', '3'))
+
+# Stage checkpoints let a timed-out run resume without re-emailing anyone.
+USE_RUN_LEDGER = os.environ.get('USE_RUN_LEDGER', '1') == '1'
+_run_ledger = None
+_run_ledger_lock = threading.Lock()
+
+
+def get_run_ledger():
+    """Return the shared run ledger, or None when USE_RUN_LEDGER is off."""
+    global _run_ledger
+    if not USE_RUN_LEDGER:
+        return None
+    if _run_ledger is None:
+        with _run_ledger_lock:
+            if _run_ledger is None:
+                if os.environ.get('K_SERVICE') and not os.environ.get('RHM_STATE_DIR'):
+                    print("Warning: RHM_STATE_DIR is not set, so the run ledger is local to this "
+                          "instance; a retry on another instance may email clients again")
+                _run_ledger = RunLedger()
+    return _run_ledger
+
+
+def completed_stages(ledger, run_key, client):
+    """Return {stage: detail} for the stages a client already finished in a run."""
+    if ledger is None:
+        return {}
+    stages = ledger.stages(run_key).get(client['slug'], {})
+    return {stage: entry['detail'] for stage, entry in stages.items() if entry['status'] == 'done'}
+
+
+def checkpoint(ledger, run_key, client, stage, detail=None):
+    """Record a finished stage for a client (no-op without a ledger)."""
+    if ledger is not None:
+        ledger.record(run_key, client['slug'], stage, detail)
+
+
+def record_timing(ledger, client, stage, started):
+    """Record how long a stage took since `started` (no-op without a ledger)."""
+    if ledger is not None:
+        ledger.record_timing(client['slug'], stage, time.monotonic() - started)
+
+
+def get_request_param(request, name, default=None):
+    """Read a parameter from the HTTP request query string or JSON body."""
+    if request is None:
+        return default
+    args = getattr(request, 'args', None) or {}
+    if name in args:
+        return args.get(name)
+    body = request.get_json(silent=True) if hasattr(request, 'get_json') else None
+    if isinstance(body, dict) and name in body:
+        return body[name]
+    return default
+
+
+def make_stage_gates(workers, limits=None):
+    """
+    Build one semaphore per pipeline stage.
+
+    Each stage runs up to its `limits` entry (default STAGE_LIMITS) of
+    clients at a time, capped at `workers`, so a worker waiting on a busy
+    stage leaves the others free to move clients through the rest.
+    """
+    limits = STAGE_LIMITS if limits is None else limits
+    return {
+        stage: threading.BoundedSemaphore(max(1, min(int(workers), int(limit))))
+        for stage, limit in limits.items()
+    }
+
+
+def prefetch_manager_batch(clients, date_range, deadline=None, predictions=None):
+    """
+    Fetch the current and previous periods for every active client under
+    the manager account in one concurrent batch, in the order given.
+    Returns {customer_id: (frame or exception, fetch seconds)}; clients not
+    under the manager, or not started before `deadline` (judged by their
+    `predictions`, keyed by slug), are left out and fetched on their own
+    or deferred.
+    """
+    manager_id = get_manager_customer_id()
+    children = discover_child_accounts(manager_id)
+
+    customer_ids = []
+    customer_predictions = {}
+    for client in clients:
+        if not client.get('active', True):
+            continue
+        customer_id = str(client['customer_id']).replace('-', '')
+        if customer_id in children:
+            customer_ids.append(customer_id)
+            if predictions and client['slug'] in predictions:
+                customer_predictions[customer_id] = predictions[client['slug']]
+        else:
+            print(f"{client['name']} ({customer_id}) is not under manager {manager_id}; fetching it on its own")
+
+    periods = get_comparison_periods(date_range['start_date'], date_range['end_date'], comparisons=1)
+    print(f"Fetching {len(customer_ids)} accounts under manager {manager_id}")
+    return fetch_manager_frames(
+        customer_ids,
+        min(start for start, _ in periods),
+        max(end for _, end in periods),
+        ADS_FETCH_MODE,
+        get_metrics_store(),
+        deadline=deadline,
+        predictions=customer_predictions
+    )
+
+
+def fetch_stage(client, date_range, prefetched=None):
+    """
+    Fetch current and previous period data for a client, from the
+    manager batch when it has the client's account, plus the report
+    period's optional report sections.
+    """
+    account = get_customer_account(
+        client['customer_id'],
+        use_proto_plus=ADS_FETCH_MODE != 'stream'
+    )
+
+    if prefetched and account.customer_id in prefetched:
+        frame, _ = prefetched[account.customer_id]
+        if isinstance(frame, Exception):
+            raise frame
+        current_period, prev_period = get_comparison_periods(date_range['start_date'], date_range['end_date'])
+        current_data, prev_data = frame.select_dates(*current_period), frame.select_dates(*prev_period)
+    else:
+        current_data, prev_data = fetch_current_and_previous(
+            account,
+            date_range['start_date'],
+            date_range['end_date'],
+            mode=ADS_FETCH_MODE,
+            store=get_metrics_store()
+        )
+
+    return current_data, prev_data, fetch_report_breakdowns(account, client, date_range, ADS_FETCH_MODE)
+
+
+def prefetched_seconds(prefetched, client):
+    """Seconds the manager batch spent fetching a client's account (0 if it did not)."""
+    customer_id = str(client['customer_id']).replace('-', '')
+    if not prefetched or customer_id not in prefetched:
+        return 0.0
+    return prefetched[customer_id][1]
+
+
+def render_stage(client, current_data, prev_data, date_range, breakdowns=None):
+    """Render the HTML report for a client."""
+    return generate_html_report(
+        client['name'],
+        current_data,
+        prev_data,
+        date_range,
+        breakdowns,
+        enabled_sections(client)
+    )
+
+
+def publish_stage(client, html, date_range, batch):
+    """Stage the rendered report for the run's single commit and return its URL."""
+    return stage_report(client['slug'], html, date_range, batch)
+
+
+def notify_stage(client, report_url, date_range):
+    """Email the report link to the client."""
+    return send_email_notification(client, report_url, date_range)
+
+
+def process_client(client, date_range, gates, batch, ledger=None, run_key=None, deadline=None,
+                   predicted_seconds=0, prefetched=None):
+    """
+    Run every stage for one client and return its result entry. Stages
+    already checkpointed for `run_key` are skipped. A client that still
+    needs fetching is left unstarted ('deferred') when its predicted
+    duration no longer fits before `deadline`. `prefetched` holds (frame,
+    fetch seconds) pairs from a manager-account batch fetch; a client it
+    already has is always finished, as its fetch was started under the
+    deadline there.
+    """
+    try:
+        done = completed_stages(ledger, run_key, client)
+        if 'publish' in done:
+            print(f"Skipping {client['name']}: report already published")
+            return {
+                'client': client['name'],
+                'status': 'success',
+                'url': done['publish']['url'],
+                'resumed': True
+            }
+
+        if 'render' in done:
+            print(f"Resuming {client['name']} from its rendered report...")
+            html = done['render']['html']
+        else:
+            fetched = bool(prefetched) and str(client['customer_id']).replace('-', '') in prefetched
+            if deadline is not None and not fetched and not deadline.can_start(predicted_seconds):
+                print(f"Deferring {client['name']}: predicted {predicted_seconds:.1f}s, "
+                      f"{deadline.remaining():.1f}s left")
+                return {
+                    'client': client['name'],
+                    'status': 'deferred'
+                }
+
+            print(f"Processing {client['name']}...")
+
+            with gates['fetch']:
+                started = time.monotonic()
+                current_data, prev_data, breakdowns = fetch_stage(client, date_range, prefetched)
+                # A frame from the manager batch was fetched before this
+                # stage started; count that fetch's own duration too.
+                batch_seconds = prefetched_seconds(prefetched, client)
+                record_timing(ledger, client, 'fetch', started - batch_seconds)
+            checkpoint(ledger, run_key, client, 'fetch')
+
+            with gates['render']:
+                started = time.monotonic()
+                html = render_stage(client, current_data, prev_data, date_range, breakdowns)
+                record_timing(ledger, client, 'render', started)
+            checkpoint(ledger, run_key, client, 'render', {'html': html})
+
+        with gates['publish']:
+            report_url = publish_stage(client, html, date_range, batch)
+
+        return {
+            'client': client['name'],
+            'status': 'success',
+            'url': report_url
+        }
+
+    except Exception as e:
+        print(f"Error processing {client['name']}: {e}")
+        return {
+            'client': client['name'],
+            'status': 'error',
+            'error': str(e)
+        }
+
+
+def notify_once(client, report_url, date_range, ledger=None, run_key=None):
+    """
+    Email a client unless this run already did. The notify stage is claimed
+    before sending, so a crash mid-send can never lead to a second email;
+    a send that is known to have failed releases the claim for a retry.
+    """
+    if ledger is not None and not ledger.claim(run_key, client['slug'], 'notify'):
+        print(f"Skipping email to {client['name']}: already notified")
+        return False
+
+    sent = notify_stage(client, report_url, date_range)
+    if ledger is not None:
+        if sent:
+            ledger.record(run_key, client['slug'], 'notify')
+        else:
+            ledger.release(run_key, client['slug'], 'notify')
+    return sent
+
+
+def run_client_pipeline(clients, date_range, workers=REPORT_WORKERS, restart=False, deadline=None):
+    """
+    Process clients with bounded concurrency.
+
+    Each client moves through fetch -> render -> stage concurrently, so one
+    client's API wait overlaps another client's rendering. All staged
+    reports are then pushed as a single commit, and clients are emailed
+    once their report is live. Results keep the order of `clients`.
+
+    Stages are checkpointed in the run ledger under 'report:<folder>', so
+    re-triggering the same week resumes it; `restart` clears these
+    clients' checkpoints for the week first. Clients start slowest-first by their recorded
+    stage timings, and with a `deadline` those that would not finish in
+    time are returned as 'deferred' instead of being started.
+    """
+    workers = max(1, int(workers))
+    gates = make_stage_gates(workers)
+    batch = new_publish_batch(f"report-{date_range['folder_name']}")
+
+    ledger = get_run_ledger()
+    run_key = f"report:{date_range['folder_name']}"
+    if ledger is not None and restart:
+        ledger.reset(run_key, [client['slug'] for client in clients])
+
+    timings = ledger.recent_timings() if ledger is not None else {}
+    predictions = predict_durations(clients, timings)
+
+    prefetched = None
+    if ADS_FETCH_SCOPE == 'manager':
+        pending = [
+            client for client in longest_first(clients, predictions)
+            if not {'publish', 'render'} & set(completed_stages(ledger, run_key, client))
+        ]
+        try:
+            prefetched = prefetch_manager_batch(pending, date_range, deadline, predictions)
+        except Exception as e:
+            print(f"Manager batch fetch failed, fetching clients one by one: {e}")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            client['slug']: pool.submit(
+                process_client, client, date_range, gates, batch, ledger, run_key,
+                deadline, predictions[client['slug']], prefetched
+            )
+            for client in longest_first(clients, predictions)
+        }
+        results = [futures[client['slug']].result() for client in clients]
+
+        message = f"Add weekly reports for {date_range['folder_name']}"
+        if not publish_staged(results, message, batch):
+            return results
+
+        for client, result in zip(clients, results):
+            if result['status'] == 'success' and not result.get('resumed'):
+                checkpoint(ledger, run_key, client, 'publish', {'url': result['url']})
+
+        def notify(client, result):
+            with gates['notify']:
+                notify_once(client, result['url'], date_range, ledger, run_key)
+
+        notifications = [
+            pool.submit(notify, client, result)
+            for client, result in zip(clients, results)
+            if result['status'] == 'success'
+        ]
+        for future in notifications:
+            future.result()
+
+    return results
+
+
+def get_handoff_url(request):
+    """URL a follow-up invocation is sent to: FUNCTION_URL, else this request's URL."""
+    url = os.environ.get('FUNCTION_URL') or getattr(request, 'base_url', None)
+    if url and url.startswith('http://') and 'localhost' not in url and '127.0.0.1' not in url:
+        # Cloud Functions terminates TLS in front of the app.
+        url = 'https://' + url[len('http://'):]
+    return url
+
+
+def hand_off(clients, handoff_url, depth=0):
+    """
+    Start a follow-up invocation for clients this run deferred. The run
+    ledger makes the follow-up resume the same week. Returns the slugs
+    handed off, or an empty list if they are left for the next trigger.
+    """
+    if not clients:
+        return []
+    slugs = [client['slug'] for client in clients]
+    if not handoff_url or depth >= MAX_HANDOFFS:
+        print(f"Not handing off {', '.join(slugs)}; re-trigger the run to resume them")
+        return []
+
+    try:
+        requests.post(
+            handoff_url,
+            json={'mode': 'report', 'clients': ','.join(slugs), 'handoff': depth + 1},
+            timeout=(5, 2)
+        )
+    except requests.exceptions.ReadTimeout:
+        pass  # The follow-up keeps running; it only had to start.
+    except requests.exceptions.RequestException as e:
+        print(f"Error handing off {', '.join(slugs)}: {e}")
+        return []
+
+    print(f"Handed off {len(slugs)} clients to a follow-up invocation")
+    return slugs
+
+
+# ============================================================================
+# SHARDED FAN-OUT
+# ============================================================================
+
+# Worker invocations a coordinator run splits the roster across.
+SHARD_COUNT = int(os.environ.get('SHARD_COUNT', '4'))
+
+
+def parse_shard(value):
+    """Parse a shard parameter like '1/4' into (index, count)."""
+    index, count = (int(part) for part in str(value).split('/'))
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard {value!r}; expected 'index/count' with 0 <= index < count")
+    return index, count
+
+
+def shard_clients(clients, index, count):
+    """
+    Return the clients in shard `index` of `count`: every count-th client
+    in clients.json order, so any invocation computes the same split.
+    """
+    return clients[index::count]
+
+
+def dispatch_shard(url, index, count, params, timeout):
+    """Run one shard as a worker invocation and return its JSON response."""
+    try:
+        response = requests.post(
+            url,
+            json={**params, 'mode': 'report', 'shard': f"{index}/{count}"},
+            timeout=timeout
+        )
+        response.raise_for_status()
+        return response.json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        return {'status': 'error', 'error': str(e)}
+
+
+def run_coordinator(clients, url, shards=SHARD_COUNT, params=None, deadline=None):
+    """
+    Split clients into shards, run each shard as a separate invocation of
+    this function at `url` in parallel, and merge their results back into
+    clients.json order. Clients of a shard that failed are reported as
+    errors. Returns (results, handed_off, quota), where quota sums the
+    shards' API usage.
+    """
+    shards = max(1, min(int(shards), len(clients)))
+    timeout = deadline.budget_seconds - deadline.elapsed() - 5 if deadline is not None else None
+
+    with ThreadPoolExecutor(max_workers=shards) as pool:
+        futures = [
+            pool.submit(dispatch_shard, url, index, shards, params or {}, timeout)
+            for index in range(shards)
+        ]
+        responses = [future.result() for future in futures]
+
+    by_client = {}
+    handed_off = []
+    quota = {}
+    for index, response in enumerate(responses):
+        shard = f"{index}/{shards}"
+        for service, counts in response.get('quota', {}).items():
+            totals = quota.setdefault(service, {})
+            for name, count in counts.items():
+                totals[name] = totals.get(name, 0) + count
+
+        if response.get('status') == 'complete':
+            for result in response['results']:
+                by_client[result['client']] = dict(result, shard=shard)
+            handed_off.extend(response.get('handed_off', []))
+            continue
+
+        print(f"Shard {shard} failed: {response.get('error')}")
+        for client in shard_clients(clients, index, shards):
+            by_client[client['name']] = {
+                'client': client['name'],
+                'status': 'error',
+                'error': f"Shard {shard} failed: {response.get('error')}",
+                'shard': shard
+            }
+
+    results = [
+        by_client.get(client['name'], {
+            'client': client['name'],
+            'status': 'error',
+            'error': 'Missing from shard results'
+        })
+        for client in clients
+    ]
+    return results, handed_off, quota
+
+
+# ============================================================================
+# CONVERSION-LAG RESTATEMENT
+# ============================================================================
+
+# Trailing window re-fetched to pick up conversions Google Ads restates later.
+RESTATEMENT_DAYS = int(os.environ.get('RESTATEMENT_DAYS', '30'))
+
+
+def affected_report_weeks(dates, latest_end_date):
+    """
+    Return date ranges of published weekly reports that use any of `dates`.
+
+    A week's report shows that week and compares against the week before,
+    so a change also affects the following week's report.
+    """
+    week_ends = set()
+    for date in dates:
+        day = datetime.strptime(date, '%Y-%m-%d')
+        sunday = day + timedelta(days=(6 - day.weekday()))
+        week_ends.update([sunday, sunday + timedelta(days=7)])
+
+    latest = datetime.strptime(latest_end_date, '%Y-%m-%d')
+    return [
+        get_date_range(sunday + timedelta(days=1))
+        for sunday in sorted(week_ends)
+        if sunday <= latest
+    ]
+
+
+def restate_client(client, window_start, window_end, latest_range, store, gates, batch):
+    """Re-fetch the trailing window for a client and republish changed reports."""
+    try:
+        account = get_customer_account(
+            client['customer_id'],
+            use_proto_plus=ADS_FETCH_MODE != 'stream'
+        )
+
+        with gates['fetch']:
+            stored = store.load_frame(account.customer_id, window_start, window_end)
+            fresh = fetch_google_ads_frame(account, window_start, window_end, ADS_FETCH_MODE)
+
+        # Days the store has never seen were never reported, so they are
+        # saved but do not count as restated.
+        known = store.fetched_dates(account.customer_id, window_start, window_end)
+        changed = [date for date in changed_dates(stored, fresh) if date in known]
+        store.save_frame(account.customer_id, fresh, window_start, window_end)
+
+        urls = []
+        for date_range in affected_report_weeks(changed, latest_range['end_date']):
+            current_data, prev_data = fetch_current_and_previous(
+                account,
+                date_range['start_date'],
+                date_range['end_date'],
+                mode=ADS_FETCH_MODE,
+                store=store
+            )
+            breakdowns = fetch_report_breakdowns(account, client, date_range, ADS_FETCH_MODE)
+
+            with gates['render']:
+                html = render_stage(client, current_data, prev_data, date_range, breakdowns)
+
+            with gates['publish']:
+                urls.append(publish_stage(client, html, date_range, batch))
+
+        print(f"Restated {client['name']}: {len(changed)} changed days, {len(urls)} reports republished")
+        return {
+            'client': client['name'],
+            'status': 'success',
+            'changed_dates': changed,
+            'republished': urls
+        }
+
+    except Exception as e:
+        print(f"Error restating {client['name']}: {e}")
+        return {
+            'client': client['name'],
+            'status': 'error',
+            'error': str(e)
+        }
+
+
+def run_restatement(clients, latest_range, days=RESTATEMENT_DAYS, workers=REPORT_WORKERS):
+    """
+    Re-fetch the last `days` days for every client and republish only the
+    weekly reports whose numbers changed. No emails are sent.
+    """
+    store = get_metrics_store()
+    if store is None:
+        raise RuntimeError('Restatement needs the metrics store (USE_METRICS_STORE=1)')
+
+    window_end = latest_range['end_date']
+    window_start = (datetime.strptime(window_end, '%Y-%m-%d') - timedelta(days=int(days) - 1)).strftime('%Y-%m-%d')
+
+    workers = max(1, int(workers))
+    gates = make_stage_gates(workers)
+    batch = new_publish_batch(f"restate-{window_end}")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(restate_client, client, window_start, window_end, latest_range, store, gates, batch)
+            for client in clients
+        ]
+        results = [future.result() for future in futures]
+
+    publish_staged(results, f"Restate reports for {window_start} to {window_end}", batch)
+    return {'start_date': window_start, 'end_date': window_end}, results
+
+
+# ============================================================================
+# HISTORICAL BACKFILL
+# ============================================================================
+
+# Longest span one weekly backfill may cover: weekly folder names (e.g.
+# 'mar2-8') carry no year, so a longer span could repeat a folder.
+BACKFILL_MAX_WEEKLY_DAYS = 366
+
+BACKFILL_GRANULARITIES = ('week', 'month')
+
+
+def get_backfill_windows(start_date, end_date, granularities=('week',)):
+    """
+    Validate a backfill span and list its (report range, comparison range)
+    windows. Raises ValueError, with a message for the caller, for missing
+    or malformed dates, an unknown granularity, or a weekly span longer
+    than BACKFILL_MAX_WEEKLY_DAYS.
+    """
+    dates = []
+    for name, value in (('start_date', start_date), ('end_date', end_date)):
+        if not value:
+            raise ValueError(f"{name} is required ('YYYY-MM-DD')")
+        try:
+            dates.append(datetime.strptime(str(value), '%Y-%m-%d'))
+        except ValueError:
+            raise ValueError(f"Invalid {name} {value!r}; expected 'YYYY-MM-DD'")
+    start, end = dates
+    if start > end:
+        raise ValueError(f"start_date {start_date} is after end_date {end_date}")
+
+    unknown = [granularity for granularity in granularities if granularity not in BACKFILL_GRANULARITIES]
+    if unknown or not granularities:
+        raise ValueError(f"Invalid granularity {','.join(unknown)!r}; expected 'week', 'month' or 'week,month'")
+    if 'week' in granularities and (end - start).days + 1 > BACKFILL_MAX_WEEKLY_DAYS:
+        raise ValueError(f"A weekly backfill covers at most {BACKFILL_MAX_WEEKLY_DAYS} days, as weekly "
+                         f"folder names have no year; split {start_date}..{end_date} into shorter spans")
+
+    windows = []
+    for granularity in granularities:
+        windows.extend(get_report_windows(start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'), granularity))
+    return windows
+
+
+def backfill_client(client, windows, gates, pool, batch, deadline=None, breakdowns=False):
+    """
+    Fetch the whole backfill span for one client with a single query, then
+    render and publish every window in parallel on `pool`. Returns the
+    window futures, or None when `deadline` leaves no time to start.
+
+    Heatmap and top-term rows are summed over a whole query span, so with
+    `breakdowns` each window costs its own extra queries; by default
+    backfilled reports leave those sections out.
+    """
+    if deadline is not None and not deadline.can_start(DEFAULT_CLIENT_SECONDS):
+        return None
+
+    span_start = min(prev_range['start_date'] for _, prev_range in windows)
+    span_end = max(date_range['end_date'] for date_range, _ in windows)
+
+    account = get_customer_account(
+        client['customer_id'],
+        use_proto_plus=ADS_FETCH_MODE != 'stream'
+    )
+    with gates['fetch']:
+        frame = fetch_google_ads_span(account, span_start, span_end, ADS_FETCH_MODE, get_metrics_store())
+
+    def publish_window(date_range, prev_range):
+        if deadline is not None and not deadline.can_start(0):
+            return {
+                'client': client['name'],
+                'folder': date_range['folder_name'],
+                'status': 'deferred'
+            }
+        try:
+            current_data = frame.select_dates(date_range['start_date'], date_range['end_date'])
+            prev_data = frame.select_dates(prev_range['start_date'], prev_range['end_date'])
+            report_breakdowns = None
+            if breakdowns:
+                with gates['fetch']:
+                    report_breakdowns = fetch_report_breakdowns(account, client, date_range, ADS_FETCH_MODE)
+
+            with gates['render']:
+                html = render_stage(client, current_data, prev_data, date_range, report_breakdowns)
+
+            with gates['publish']:
+                report_url = publish_stage(client, html, date_range, batch)
+
+            return {
+                'client': client['name'],
+                'folder': date_range['folder_name'],
+                'status': 'success',
+                'url': report_url
+            }
+        except Exception as e:
+            print(f"Error backfilling {client['name']} {date_range['folder_name']}: {e}")
+            return {
+                'client': client['name'],
+                'folder': date_range['folder_name'],
+                'status': 'error',
+                'error': str(e)
+            }
+
+    return [pool.submit(publish_window, date_range, prev_range) for date_range, prev_range in windows]
+
+
+def run_backfill(clients, start_date, end_date, granularities=('week',), workers=REPORT_WORKERS,
+                 deadline=None, breakdowns=False):
+    """
+    Generate and publish reports for every week (and/or month) in a span.
+
+    Each client costs one Google Ads query for the whole span (plus the
+    per-window breakdown queries with `breakdowns`); windows are split in
+    memory and rendered/published in parallel. No emails are sent. With a
+    `deadline`, clients and windows that no longer fit are returned as
+    'deferred' and everything finished so far is still published.
+    Raises ValueError for an invalid span (see get_backfill_windows).
+    """
+    windows = get_backfill_windows(start_date, end_date, granularities)
+    if not windows:
+        return []
+
+    workers = max(1, int(workers))
+    gates = make_stage_gates(workers)
+    batch = new_publish_batch(f"backfill-{start_date}-{end_date}")
+    results = []
+
+    with ThreadPoolExecutor(max_workers=workers) as fetch_pool, \
+            ThreadPoolExecutor(max_workers=workers) as publish_pool:
+        client_futures = [
+            (client, fetch_pool.submit(backfill_client, client, windows, gates, publish_pool, batch,
+                                       deadline, breakdowns))
+            for client in clients
+        ]
+        for client, client_future in client_futures:
+            try:
+                window_futures = client_future.result()
+            except Exception as e:
+                print(f"Error backfilling {client['name']}: {e}")
+                results.append({'client': client['name'], 'status': 'error', 'error': str(e)})
+                continue
+            if window_futures is None:
+                results.extend(
+                    {'client': client['name'], 'folder': date_range['folder_name'], 'status': 'deferred'}
+                    for date_range, _ in windows
+                )
+                continue
+            results.extend(future.result() for future in window_futures)
+
+    deferred = sum(1 for result in results if result['status'] == 'deferred')
+    if deferred:
+        print(f"Deadline reached: deferred {deferred} backfill reports; re-run them in a new request")
+
+    publish_staged(results, f"Backfill reports for {start_date} to {end_date}", batch)
+    return results
+
+
+# ============================================================================
+# WARM-UP
+# ============================================================================
+
+# Smallest query that opens the Google Ads channel and refreshes its token.
+WARM_UP_QUERY = "SELECT customer.id FROM customer LIMIT 1"
+
+
+def warm_up_google_ads(clients):
+    """
+    Create the shared Google Ads client and service for ADS_FETCH_MODE and
+    run one tiny query, against the manager account in manager scope or
+    else the first active client.
+    """
+    if ADS_FETCH_SCOPE == 'manager':
+        customer_id = get_manager_customer_id()
+    else:
+        customer_id = next(client['customer_id'] for client in clients if client.get('active', True))
+    account = get_customer_account(customer_id, use_proto_plus=ADS_FETCH_MODE != 'stream')
+    run_report_query(account, WARM_UP_QUERY, ADS_FETCH_MODE, list)
+
+
+def warm_up(clients):
+    """
+    Initialise the shared resources a run uses, so a run that follows on
+    this instance starts hot: secrets, the Google Ads client and channel,
+    the publisher's connection and the local stores.
+
+    Returns ({resource: seconds}, {resource: error}); a failed step is
+    reported, not raised, and left for the run itself to retry.
+    """
+    steps = [
+        ('secrets', prefetch_secrets),
+        ('google_ads', lambda: warm_up_google_ads(clients)),
+        ('publisher', lambda: get_publisher().warm_up()),
+        ('metrics_store', get_metrics_store),
+        ('reference_cache', get_reference_cache),
+        ('run_ledger', get_run_ledger),
+    ]
+
+    warmed, errors = {}, {}
+    for name, step in steps:
+        started = time.monotonic()
+        try:
+            step()
+            warmed[name] = round(time.monotonic() - started, 3)
+        except Exception as e:
+            print(f"Warm-up of {name} failed: {e}")
+            errors[name] = str(e)
+    print(f"Warmed up {', '.join(warmed) or 'nothing'}")
+    return warmed, errors
 
 
 # ============================================================================
@@ -778,67 +2419,125 @@ def generate_weekly_reports(request):
     """
     Main Cloud Function entry point.
     Triggered by Cloud Scheduler every Monday at 8:00 AM CST.
+
+    Optional request parameters:
+        mode    - 'report' (default), 'restate' to re-fetch the last
+                  RESTATEMENT_DAYS days and republish changed reports,
+                  'backfill' to publish every week in start_date..end_date,
+                  'coordinate' to split the report run into `shards`
+                  worker invocations (default SHARD_COUNT), or 'warmup'
+                  to only initialise clients and connections for a run
+                  scheduled shortly after
+        workers - number of clients processed concurrently (default REPORT_WORKERS)
+        restart - '1' to ignore this week's checkpoints and start over; by
+                  default a repeated report run resumes the week
+        clients - comma-separated slugs to report on (default: all)
+        handoff - set on follow-up invocations for deferred clients
+        shard   - 'index/count': report only on that shard of the clients
+
+    Backfill parameters:
+        start_date, end_date - span to backfill ('YYYY-MM-DD')
+        clients              - comma-separated slugs (default: all)
+        granularity          - 'week', 'month' or 'week,month' (default 'week')
+        breakdowns           - '1' to fetch the heatmap and top-K sections
+                               for every window (extra queries per window)
+    An invalid span is answered with status 400; windows that would not
+    finish before the deadline come back as 'deferred'.
     """
+    deadline = Deadline()
+    reset_usage()
     try:
         clients = load_clients_config()
         date_range = get_date_range()
+        mode = get_request_param(request, 'mode', 'report')
+        workers = get_request_param(request, 'workers', REPORT_WORKERS)
+
+        if mode == 'warmup':
+            warmed, errors = warm_up(clients['clients'])
+            return {
+                'status': 'complete',
+                'mode': 'warmup',
+                'warmed': warmed,
+                'errors': errors
+            }
 
-        results = []
-
-        for client in clients['clients']:
-            try:
-                print(f"Processing {client['name']}...")
-
-                # Initialize Google Ads client
-                ads_client = get_google_ads_client(client)
+        if mode == 'coordinate':
+            selected = select_clients(clients['clients'], get_request_param(request, 'clients'))
+            params = {
+                'workers': workers,
+                'restart': get_request_param(request, 'restart', '0'),
+                'clients': get_request_param(request, 'clients')
+            }
+            results, handed_off, quota = run_coordinator(
+                selected,
+                get_handoff_url(request),
+                get_request_param(request, 'shards', SHARD_COUNT),
+                params,
+                deadline
+            )
+            return {
+                'status': 'complete',
+                'mode': 'coordinate',
+                'date_range': date_range,
+                'results': results,
+                'handed_off': handed_off,
+                'quota': quota
+            }
 
-                # Fetch current and previous period data
-                current_data = fetch_google_ads_data(
-                    ads_client,
-                    client['customer_id'],
-                    date_range['start_date'],
-                    date_range['end_date']
-                )
+        prefetch_secrets()
 
-                prev_data = fetch_previous_period_data(
-                    ads_client,
-                    client['customer_id'],
-                    date_range['start_date'],
-                    date_range['end_date']
-                )
+        if mode == 'restate':
+            window, results = run_restatement(clients['clients'], date_range, workers=workers)
+            return {
+                'status': 'complete',
+                'mode': 'restate',
+                'date_range': window,
+                'results': results,
+                'quota': quota_usage()
+            }
 
-                # Generate HTML report
-                html = generate_html_report(
-                    client['name'],
-                    current_data,
-                    prev_data,
-                    date_range
+        if mode == 'backfill':
+            selected = select_clients(clients['clients'], get_request_param(request, 'clients'))
+            try:
+                results = run_backfill(
+                    selected,
+                    get_request_param(request, 'start_date'),
+                    get_request_param(request, 'end_date'),
+                    str(get_request_param(request, 'granularity', 'week')).split(','),
+                    workers,
+                    deadline,
+                    str(get_request_param(request, 'breakdowns', '0')).lower() in ('1', 'true')
                 )
+            except ValueError as e:
+                print(f"Invalid backfill request: {e}")
+                return {'status': 'error', 'mode': 'backfill', 'error': str(e)}, 400
+            return {
+                'status': 'complete',
+                'mode': 'backfill',
+                'results': results,
+                'quota': quota_usage()
+            }
 
-                # Deploy to GitHub Pages
-                report_url = deploy_to_github(client['slug'], html, date_range)
-
-                # Send email notification
-                send_email_notification(client, report_url, date_range)
-
-                results.append({
-                    'client': client['name'],
-                    'status': 'success',
-                    'url': report_url
-                })
+        restart = str(get_request_param(request, 'restart', '0')).lower() in ('1', 'true')
+        selected = select_clients(clients['clients'], get_request_param(request, 'clients'))
+        shard = get_request_param(request, 'shard')
+        if shard:
+            selected = shard_clients(selected, *parse_shard(shard))
+        results = run_client_pipeline(selected, date_range, workers, restart, deadline)
 
-            except Exception as e:
-                print(f"Error processing {client['name']}: {e}")
-                results.append({
-                    'client': client['name'],
-                    'status': 'error',
-                    'error': str(e)
-                })
+        deferred = [client for client, result in zip(selected, results) if result['status'] == 'deferred']
+        handed_off = hand_off(
+            deferred,
+            get_handoff_url(request),
+            int(get_request_param(request, 'handoff', 0))
+        )
 
         return {
             'status': 'complete',
             'date_range': date_range,
-            'results': results
+            'results': results,
+            'handed_off': handed_off,
+            'quota': quota_usage()
         }
 
     except Exception as e:
@@ -12,6 +12,8 @@ Then paste the data when prompted.
 import json
 from datetime import datetime, timedelta
 
+from metrics_frame import MetricsFrame
+
 def get_report_template():
     """Return the HTML report template."""
     return '''<!DOCTYPE html>
@@ -186,7 +188,7 @@ def get_report_template():
     </div>
 
     <footer class="footer">
-        <p>Report generated on {generated_date}</p>
+        <p>Reporting period: {date_range}</p>
         <p style="margin-top: 8px;">Powered by <a href="https://roberthebertmedia.com">Robert Hebert Media</a></p>
     </footer>
 </body>
@@ -275,9 +277,18 @@ def main():
     prev_conversions = get_float("  Conversions: ")
 
     # Calculate metrics
-    ctr = (clicks / impressions * 100) if impressions > 0 else 0
-    cpl = spend / conversions if conversions > 0 else 0
-    cvr = (conversions / clicks * 100) if clicks > 0 else 0
+    current = MetricsFrame.from_totals(
+        impressions=impressions, clicks=clicks,
+        cost_micros=spend * 1_000_000, conversions=conversions
+    ).totals()
+    previous = MetricsFrame.from_totals(
+        impressions=prev_impressions, clicks=prev_clicks,
+        cost_micros=prev_spend * 1_000_000, conversions=prev_conversions
+    ).totals()
+
+    ctr = current['ctr'] * 100
+    cpl = current['cpl'] / 1_000_000
+    cvr = current['conversion_rate'] * 100
 
     # Calculate changes
     def calc_change(curr, prev):
@@ -290,10 +301,10 @@ def main():
     clicks_chg = calc_change(clicks, prev_clicks)
     impr_chg = calc_change(impressions, prev_impressions)
 
-    prev_cpl = prev_spend / prev_conversions if prev_conversions > 0 else 0
+    prev_cpl = previous['cpl'] / 1_000_000
     cpl_chg = calc_change(cpl, prev_cpl)
 
-    prev_cvr = (prev_conversions / prev_clicks * 100) if prev_clicks > 0 else 0
+    prev_cvr = previous['conversion_rate'] * 100
     cvr_chg = calc_change(cvr, prev_cvr)
 
     # Get campaign data
@@ -313,8 +324,8 @@ def main():
         c_conv = get_float("  Conversions: ")
 
         campaigns.append({
-            'name': name,
-            'spend': c_spend,
+            'campaign': name,
+            'cost_micros': c_spend * 1_000_000,
             'impressions': c_impr,
             'clicks': c_clicks,
             'conversions': c_conv
@@ -322,18 +333,16 @@ def main():
 
     # Generate campaign rows HTML
     campaign_rows = ""
-    for c in campaigns:
-        c_cpl = c['spend'] / c['conversions'] if c['conversions'] > 0 else 0
-        c_cvr = (c['conversions'] / c['clicks'] * 100) if c['clicks'] > 0 else 0
+    for c in MetricsFrame.from_records(campaigns).by_campaign():
         campaign_rows += f"""
             <tr>
                 <td style="font-weight: 600;">{c['name']}</td>
-                <td>{format_currency(c['spend'])}</td>
+                <td>{format_currency(c['cost_micros'] / 1_000_000)}</td>
                 <td>{format_number(c['impressions'])}</td>
                 <td>{format_number(c['clicks'])}</td>
                 <td>{c['conversions']:.1f}</td>
-                <td>{format_currency(c_cpl)}</td>
-                <td>{c_cvr:.1f}%</td>
+                <td>{format_currency(c['cpl'] / 1_000_000)}</td>
+                <td>{c['conversion_rate'] * 100:.1f}%</td>
             </tr>
         """
 
@@ -357,8 +366,7 @@ def main():
         cvr_change=change_indicator(cvr_chg),
         clicks_change=change_indicator(clicks_chg),
         impr_change=change_indicator(impr_chg),
-        campaign_rows=campaign_rows,
-        generated_date=datetime.now().strftime('%B %d, %Y at %I:%M %p')
+        campaign_rows=campaign_rows
     )
 
     # Determine folder name
@@ -0,0 +1,357 @@
+"""
+Robert Hebert Media - Columnar Metrics Frame
+
+Array-backed container for Google Ads metrics keyed by campaign, date and
+device. Each dimension's labels are interned to integer indices and each
+metric is one NumPy column. Any rollup (per campaign, per day, per device,
+campaign x day, totals) is a bincount per column into an accumulator
+preallocated for every combination of the grouped labels, rather than
+per-row dict updates, so a new breakdown needs no extra API call.
+"""
+
+from array import array
+
+import numpy as np
+
+
+# Dimensions every row is keyed by.
+DIMENSION_COLUMNS = ('campaign', 'date', 'device')
+
+# Additive metrics stored per row. Integer metrics are summed as int64.
+METRIC_COLUMNS = ('impressions', 'clicks', 'cost_micros', 'conversions', 'conversions_value', 'all_conversions')
+INTEGER_METRICS = ('impressions', 'clicks', 'cost_micros')
+
+
+def safe_divide(numerator, denominator):
+    """Divide arrays or scalars, returning 0 where the denominator is 0."""
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+    out = np.zeros(np.broadcast(numerator, denominator).shape)
+    np.divide(numerator, denominator, out=out, where=denominator != 0)
+    return out
+
+
+def derived_metrics(sums):
+    """
+    Compute CTR, CPC, CPL, conversion rate and ROAS from summed metrics.
+
+    Works on scalar totals or on per-group arrays. CTR and conversion rate
+    are ratios (0.05 = 5%); CPC and CPL are in micros; ROAS is conversion
+    value per unit of spend.
+    """
+    return {
+        'ctr': safe_divide(sums['clicks'], sums['impressions']),
+        'cpc': safe_divide(sums['cost_micros'], sums['clicks']),
+        'cpl': safe_divide(sums['cost_micros'], sums['conversions']),
+        'conversion_rate': safe_divide(sums['conversions'], sums['clicks']),
+        'roas': safe_divide(np.asarray(sums['conversions_value'], dtype=np.float64) * 1_000_000,
+                            sums['cost_micros']),
+    }
+
+
+def percent_change(current, previous):
+    """Vectorised calculate_change: % change, 100 when previous is 0 and current is not."""
+    current = np.asarray(current, dtype=np.float64)
+    previous = np.asarray(previous, dtype=np.float64)
+    change = safe_divide(current - previous, previous) * 100
+    return np.where(previous == 0, np.where(current == 0, 0.0, 100.0), change)
+
+
+def enum_name(value):
+    """Name of a proto-plus enum value; plain values are returned as-is."""
+    return getattr(value, 'name', value)
+
+
+class MetricsFrameBuilder:
+    """Collects rows into typed column buffers and builds a MetricsFrame."""
+
+    def __init__(self):
+        self.label_ids = {dimension: {} for dimension in DIMENSION_COLUMNS}
+        # Name and status of each campaign label, as first seen.
+        self.campaign_names = []
+        self.campaign_statuses = []
+        self.indexes = {dimension: array('l') for dimension in DIMENSION_COLUMNS}
+        self.columns = {metric: array('q' if metric in INTEGER_METRICS else 'd') for metric in METRIC_COLUMNS}
+
+    def add(self, campaign, status, date, impressions, clicks, cost_micros, conversions,
+            conversions_value=0.0, all_conversions=0.0, device=''):
+        """Append one campaign/date/device row."""
+        campaign_ids = self.label_ids['campaign']
+        campaign_id = campaign_ids.get(campaign)
+        if campaign_id is None:
+            campaign_id = campaign_ids[campaign] = len(campaign_ids)
+            self.campaign_names.append(campaign)
+            self.campaign_statuses.append(status)
+        date_id = self.label_ids['date'].setdefault(date, len(self.label_ids['date']))
+        device_id = self.label_ids['device'].setdefault(device, len(self.label_ids['device']))
+
+        self.indexes['campaign'].append(campaign_id)
+        self.indexes['date'].append(date_id)
+        self.indexes['device'].append(device_id)
+        self.columns['impressions'].append(int(round(impressions)))
+        self.columns['clicks'].append(int(round(clicks)))
+        self.columns['cost_micros'].append(int(round(cost_micros)))
+        self.columns['conversions'].append(conversions)
+        self.columns['conversions_value'].append(conversions_value)
+        self.columns['all_conversions'].append(all_conversions)
+
+    def add_rows(self, rows):
+        """
+        Append Google Ads campaign rows (proto-plus or raw protobuf).
+
+        Campaigns are keyed by campaign.id. Their name and status are taken
+        from the row when the query selected them; otherwise build() joins
+        them from reference data. Each field is read once into a local; the column appends are bound
+        up front to keep the per-row cost low.
+        """
+        campaign_ids = self.label_ids['campaign']
+        date_ids = self.label_ids['date']
+        device_ids = self.label_ids['device']
+        names = self.campaign_names
+        statuses = self.campaign_statuses
+        add_campaign = self.indexes['campaign'].append
+        add_date = self.indexes['date'].append
+        add_device = self.indexes['device'].append
+        add_impressions = self.columns['impressions'].append
+        add_clicks = self.columns['clicks'].append
+        add_cost = self.columns['cost_micros'].append
+        add_conversions = self.columns['conversions'].append
+        add_conversions_value = self.columns['conversions_value'].append
+        add_all_conversions = self.columns['all_conversions'].append
+
+        for row in rows:
+            campaign = row.campaign
+            segments = row.segments
+            metrics = row.metrics
+            key = campaign.id
+            date = segments.date
+            device = segments.device
+
+            campaign_id = campaign_ids.get(key)
+            if campaign_id is None:
+                campaign_id = campaign_ids[key] = len(campaign_ids)
+                names.append(campaign.name)
+                statuses.append(campaign.status)
+            date_id = date_ids.get(date)
+            if date_id is None:
+                date_id = date_ids[date] = len(date_ids)
+            device_id = device_ids.get(device)
+            if device_id is None:
+                device_id = device_ids[device] = len(device_ids)
+
+            add_campaign(campaign_id)
+            add_date(date_id)
+            add_device(device_id)
+            add_impressions(metrics.impressions)
+            add_clicks(metrics.clicks)
+            add_cost(metrics.cost_micros)
+            add_conversions(metrics.conversions)
+            add_conversions_value(metrics.conversions_value)
+            add_all_conversions(metrics.all_conversions)
+
+    def campaign_keys(self):
+        """The distinct campaign keys added so far (campaign ids for API rows)."""
+        return list(self.label_ids['campaign'])
+
+    def build(self, enum_names=None, campaigns=None):
+        """
+        Return the collected rows as a MetricsFrame.
+
+        `enum_names` maps 'status' and/or 'device' to a function turning raw
+        enum values into names; by default the value's `.name` is used when
+        it has one. `campaigns` maps str(campaign key) to {'name', 'status'}
+        reference data, which replaces the values read from the rows.
+        """
+        enum_names = enum_names or {}
+        status_name = enum_names.get('status', enum_name)
+        device_name = enum_names.get('device', enum_name)
+
+        labels = {dimension: list(ids) for dimension, ids in self.label_ids.items()}
+        labels['device'] = [device_name(device) for device in labels['device']]
+        labels['campaign'] = list(self.campaign_names)
+        statuses = [status_name(status) for status in self.campaign_statuses]
+        if campaigns is not None:
+            for i, key in enumerate(self.label_ids['campaign']):
+                campaign = campaigns.get(str(key))
+                if campaign is not None:
+                    labels['campaign'][i] = campaign['name']
+                    statuses[i] = campaign['status']
+        return MetricsFrame(
+            labels=labels,
+            statuses=statuses,
+            indexes={dimension: np.array(values, dtype=np.int64) for dimension, values in self.indexes.items()},
+            columns={
+                metric: np.array(values, dtype=np.int64 if metric in INTEGER_METRICS else np.float64)
+                for metric, values in self.columns.items()
+            },
+        )
+
+
+class MetricsFrame:
+    """
+    Columnar campaign x date x device metrics.
+
+    `labels` maps each dimension in DIMENSION_COLUMNS to its interned labels
+    and `indexes` to each row's position in them; `statuses` holds the
+    status of each campaign label; `columns` maps each metric in
+    METRIC_COLUMNS to a NumPy array with one value per row.
+    """
+
+    def __init__(self, labels, statuses, indexes, columns):
+        self.labels = labels
+        self.statuses = statuses
+        self.indexes = {dimension: np.asarray(values, dtype=np.int64) for dimension, values in indexes.items()}
+        self.columns = columns
+
+    @classmethod
+    def from_records(cls, records):
+        """Build a frame from dicts with 'campaign', optional 'status'/'date'/'device' and metric keys."""
+        builder = MetricsFrameBuilder()
+        for record in records:
+            builder.add(
+                record.get('campaign', ''),
+                record.get('status', ''),
+                record.get('date', ''),
+                *(record.get(metric, 0) for metric in METRIC_COLUMNS),
+                device=record.get('device', '')
+            )
+        return builder.build()
+
+    @classmethod
+    def from_totals(cls, **metrics):
+        """Build a single-row frame from account-level totals."""
+        return cls.from_records([metrics])
+
+    def __len__(self):
+        return len(self.indexes['campaign'])
+
+    @property
+    def campaigns(self):
+        return self.labels['campaign']
+
+    @property
+    def dates(self):
+        return self.labels['date']
+
+    def filter(self, mask):
+        """Return a frame with only the rows where `mask` is true."""
+        return MetricsFrame(
+            self.labels,
+            self.statuses,
+            {dimension: values[mask] for dimension, values in self.indexes.items()},
+            {metric: values[mask] for metric, values in self.columns.items()},
+        )
+
+    def select_dates(self, start_date, end_date):
+        """Return the rows dated from start_date to end_date inclusive."""
+        in_range = np.array([start_date <= date <= end_date for date in self.dates], dtype=bool)
+        if len(in_range) == 0:
+            return self.filter(np.zeros(len(self), dtype=bool))
+        return self.filter(in_range[self.indexes['date']])
+
+    def group_sums(self, index, size):
+        """Sum every metric column grouped by `index`; also returns row counts."""
+        sums = {}
+        for metric, values in self.columns.items():
+            summed = np.bincount(index, weights=values, minlength=size)
+            sums[metric] = summed.round().astype(np.int64) if metric in INTEGER_METRICS else summed
+        return sums, np.bincount(index, minlength=size)
+
+    def group_index(self, dimensions):
+        """
+        Combine the row indexes of `dimensions` into one group id per row.
+        Returns (group ids, shape), shape being each dimension's label count.
+        """
+        shape = tuple(len(self.labels[dimension]) for dimension in dimensions)
+        if not dimensions:
+            return np.zeros(len(self), dtype=np.int64), shape
+        if len(self) == 0:
+            return np.zeros(0, dtype=np.int64), shape
+        return np.ravel_multi_index(tuple(self.indexes[dimension] for dimension in dimensions), shape), shape
+
+    def rollup(self, *dimensions):
+        """
+        Sum every metric over a combination of dimensions, e.g.
+        rollup('campaign', 'date'). Returns one dict per group with rows, in
+        label order, holding the labels (plus 'status' when grouped by
+        campaign), summed metrics and derived metrics. rollup() with no
+        dimensions is the account total.
+        """
+        index, shape = self.group_index(dimensions)
+        sums, counts = self.group_sums(index, int(np.prod(shape, dtype=np.int64)))
+        derived = derived_metrics(sums)
+
+        rows = []
+        for group in np.flatnonzero(counts).tolist():
+            row = {}
+            for dimension, position in zip(dimensions, np.unravel_index(group, shape)):
+                row[dimension] = self.labels[dimension][position]
+                if dimension == 'campaign':
+                    row['status'] = self.statuses[position]
+            row.update({metric: sums[metric][group].item() for metric in METRIC_COLUMNS})
+            row.update({name: float(values[group]) for name, values in derived.items()})
+            rows.append(row)
+        return rows
+
+    def rollups(self, *groupings):
+        """Compute several rollups from the same rows: {grouping: rollup rows}."""
+        return {tuple(grouping): self.rollup(*grouping) for grouping in groupings}
+
+    def totals(self):
+        """Account totals with derived metrics, as plain Python numbers."""
+        totals = {}
+        for metric, values in self.columns.items():
+            total = values.sum()
+            totals[metric] = int(total) if metric in INTEGER_METRICS else float(total)
+        totals.update({name: float(value) for name, value in derived_metrics(totals).items()})
+        return totals
+
+    def by_campaign(self):
+        """Per-campaign sums and derived metrics, highest spend first (ties by name)."""
+        rows = self.rollup('campaign')
+        for row in rows:
+            row['name'] = row.pop('campaign')
+        # Break spend ties by name so row order never depends on API order.
+        return sorted(rows, key=lambda row: (-row['cost_micros'], row['name']))
+
+    def by_date(self):
+        """Per-day sums for days that have rows, in date order."""
+        return {
+            row['date']: {metric: row[metric] for metric in METRIC_COLUMNS}
+            for row in sorted(self.rollup('date'), key=lambda row: row['date'])
+        }
+
+    def by_device(self):
+        """Per-device sums and derived metrics, highest spend first (ties by device)."""
+        return sorted(self.rollup('device'), key=lambda row: (-row['cost_micros'], str(row['device'])))
+
+    def records(self):
+        """Yield one dict per row with campaign, status, date, device and metrics."""
+        columns = {metric: values.tolist() for metric, values in self.columns.items()}
+        indexes = {dimension: values.tolist() for dimension, values in self.indexes.items()}
+        for i, campaign_id in enumerate(indexes['campaign']):
+            record = {
+                'campaign': self.labels['campaign'][campaign_id],
+                'status': self.statuses[campaign_id],
+                'date': self.labels['date'][indexes['date'][i]],
+                'device': self.labels['device'][indexes['device'][i]],
+            }
+            record.update({metric: values[i] for metric, values in columns.items()})
+            yield record
+
+    def to_period_data(self):
+        """Return the legacy nested-dict aggregate ({'campaigns', 'daily', 'totals'})."""
+        return {
+            'campaigns': {
+                row['name']: {
+                    'impressions': row['impressions'],
+                    'clicks': row['clicks'],
+                    'cost_micros': row['cost_micros'],
+                    'conversions': row['conversions'],
+                    'status': row['status'],
+                }
+                for row in self.by_campaign()
+            },
+            'daily': self.by_date(),
+            'totals': self.totals(),
+        }
@@ -0,0 +1,202 @@
+"""
+Robert Hebert Media - Local Daily Metrics Store
+
+SQLite store of per-customer Google Ads metrics by campaign, day and device.
+The fetch layer reads from it first and only queries the API for dates it
+has not stored yet, so a weekly run downloads one new week per client and
+the previous week comes from last week's fetch.
+
+Days are recorded with the field set of the query that fetched them, so
+after the campaign query changes (a report section was enabled or
+disabled) stored days count as missing and are fetched again.
+
+The database lives under RHM_STATE_DIR. On Cloud Functions point that at a
+mounted Cloud Storage volume so the store outlives the instance.
+"""
+
+import os
+import hashlib
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from metrics_frame import METRIC_COLUMNS, MetricsFrame
+
+
+STATE_DIR = os.environ.get('RHM_STATE_DIR', os.path.join(tempfile.gettempdir(), 'rhm-reports'))
+DEFAULT_STORE_PATH = os.path.join(STATE_DIR, 'metrics.sqlite3')
+
+# Bumped whenever the tables change. The store is a cache of the API, so
+# an older database is dropped and refetched.
+SCHEMA_VERSION = 3
+
+SCHEMA = f"""
+    CREATE TABLE IF NOT EXISTS daily_metrics (
+        customer_id TEXT NOT NULL,
+        campaign TEXT NOT NULL,
+        status TEXT,
+        date TEXT NOT NULL,
+        device TEXT NOT NULL DEFAULT '',
+        {', '.join(f'{metric} REAL NOT NULL DEFAULT 0' for metric in METRIC_COLUMNS)},
+        PRIMARY KEY (customer_id, campaign, date, device)
+    );
+    CREATE TABLE IF NOT EXISTS fetched_days (
+        customer_id TEXT NOT NULL,
+        date TEXT NOT NULL,
+        fetched_at TEXT NOT NULL,
+        query_key TEXT NOT NULL DEFAULT '',
+        PRIMARY KEY (customer_id, date)
+    );
+"""
+
+
+def date_span(start_date, end_date):
+    """List every 'YYYY-MM-DD' date from start_date to end_date inclusive."""
+    day = datetime.strptime(start_date, '%Y-%m-%d')
+    last = datetime.strptime(end_date, '%Y-%m-%d')
+    days = []
+    while day <= last:
+        days.append(day.strftime('%Y-%m-%d'))
+        day += timedelta(days=1)
+    return days
+
+
+def row_hash(record):
+    """
+    Stable digest of one campaign/date/device row's values. The campaign's
+    status is left out: it is the current status, not part of the day's
+    numbers, so pausing a campaign must not mark its past days as changed.
+    """
+    values = [record['campaign'], record['date'], str(record['device'])]
+    values += [f"{float(record[metric]):.6f}" for metric in METRIC_COLUMNS]
+    return hashlib.sha1('\x1f'.join(values).encode('utf-8')).hexdigest()
+
+
+def day_hashes(frame):
+    """Combine the row hashes of a frame into one digest per date."""
+    rows_by_date = {}
+    for record in frame.records():
+        rows_by_date.setdefault(record['date'], []).append(row_hash(record))
+    return {
+        date: hashlib.sha1(''.join(sorted(hashes)).encode('ascii')).hexdigest()
+        for date, hashes in rows_by_date.items()
+    }
+
+
+def changed_dates(old_frame, new_frame):
+    """Return the sorted dates whose rows differ between two frames."""
+    old_hashes = day_hashes(old_frame)
+    new_hashes = day_hashes(new_frame)
+    return sorted(
+        date for date in set(old_hashes) | set(new_hashes)
+        if old_hashes.get(date) != new_hashes.get(date)
+    )
+
+
+class MetricsStore:
+    """Per-customer daily campaign metrics backed by one SQLite file."""
+
+    def __init__(self, path=DEFAULT_STORE_PATH, query_key=''):
+        self.path = path
+        self.query_key = query_key
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                conn.executescript("DROP TABLE IF EXISTS daily_metrics; DROP TABLE IF EXISTS fetched_days;")
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection per call (safe across threads); commit on success."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def fetched_dates(self, customer_id, start_date, end_date):
+        """Return the set of dates already fetched for a customer with the store's query."""
+        with self._connect() as conn:
+            return {
+                date for (date,) in conn.execute(
+                    "SELECT date FROM fetched_days "
+                    "WHERE customer_id = ? AND date BETWEEN ? AND ? AND query_key = ?",
+                    (customer_id, start_date, end_date, self.query_key)
+                )
+            }
+
+    def missing_ranges(self, customer_id, start_date, end_date):
+        """Return contiguous (start, end) ranges not yet fetched for a customer."""
+        stored = self.fetched_dates(customer_id, start_date, end_date)
+
+        ranges = []
+        in_gap = False
+        for date in date_span(start_date, end_date):
+            if date in stored:
+                in_gap = False
+            elif in_gap:
+                ranges[-1] = (ranges[-1][0], date)
+            else:
+                ranges.append((date, date))
+                in_gap = True
+        return ranges
+
+    def save_frame(self, customer_id, frame, start_date, end_date, complete_before=None):
+        """
+        Replace stored rows for start_date..end_date with the rows in `frame`.
+
+        Days on or after `complete_before` (default: today) are stored but not
+        marked as fetched, so they are queried again on the next run.
+        """
+        complete_before = complete_before or datetime.now().strftime('%Y-%m-%d')
+        fetched_at = datetime.now().isoformat(timespec='seconds')
+        columns = ', '.join(METRIC_COLUMNS)
+        updates = ', '.join(f'{metric} = {metric} + excluded.{metric}' for metric in METRIC_COLUMNS)
+
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM daily_metrics WHERE customer_id = ? AND date BETWEEN ? AND ?",
+                (customer_id, start_date, end_date)
+            )
+            conn.executemany(
+                f"""
+                INSERT INTO daily_metrics (customer_id, campaign, status, date, device, {columns})
+                VALUES (?, ?, ?, ?, ?, {', '.join('?' for _ in METRIC_COLUMNS)})
+                ON CONFLICT (customer_id, campaign, date, device) DO UPDATE SET {updates}
+                """,
+                (
+                    (customer_id, record['campaign'], record['status'], record['date'], str(record['device']),
+                     *(record[metric] for metric in METRIC_COLUMNS))
+                    for record in frame.records()
+                    if start_date <= record['date'] <= end_date
+                )
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO fetched_days (customer_id, date, fetched_at, query_key) VALUES (?, ?, ?, ?)",
+                (
+                    (customer_id, date, fetched_at, self.query_key)
+                    for date in date_span(start_date, end_date)
+                    if date < complete_before
+                )
+            )
+
+    def load_frame(self, customer_id, start_date, end_date):
+        """Return stored rows for a customer and date range as a MetricsFrame."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT campaign, status, date, device, {', '.join(METRIC_COLUMNS)}
+                FROM daily_metrics
+                WHERE customer_id = ? AND date BETWEEN ? AND ?
+                ORDER BY date, campaign, device
+                """,
+                (customer_id, start_date, end_date)
+            ).fetchall()
+
+        return MetricsFrame.from_records(
+            dict(zip(('campaign', 'status', 'date', 'device') + METRIC_COLUMNS, row)) for row in rows
+        )
+
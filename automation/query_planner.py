@@ -0,0 +1,83 @@
+"""
+Robert Hebert Media - GAQL Query Planner
+
+Report sections declare which query source they read (a GAQL resource with
+its filters and row grain) and which fields they need from it. The planner
+merges the enabled sections into one query per source with the union of
+their fields, and writes the SELECT lists. A disabled section adds no
+field and, if it was a source's only reader, no query: nothing is sent,
+downloaded or decoded for it.
+"""
+
+
+# Fields are selected attributes first, then segments, then metrics, each
+# in the order the sections first declared them.
+FIELD_KIND_ORDER = ('segments.', 'metrics.')
+
+
+def field_kind(field):
+    """0 for resource attributes, 1 for segments, 2 for metrics."""
+    for i, prefix in enumerate(FIELD_KIND_ORDER):
+        if field.startswith(prefix):
+            return i + 1
+    return 0
+
+
+def plan_queries(sections, enabled, sources):
+    """
+    Merge the `enabled` section names into one plan per query source.
+
+    `sections` maps a section name to {'source', 'fields'}; `sources` maps
+    a source name to {'resource', 'key_fields', 'where', 'order_by',
+    'allowed'}. A source's key_fields (the row grain its accumulator needs)
+    are always selected; `allowed`, when given, lists every field the
+    source may select. Returns {source: {'resource', 'fields', 'where',
+    'order_by', 'sections'}} for the sources with an enabled section.
+    Raises ValueError for unknown sections or fields a source does not allow.
+    """
+    plans = {}
+    for name in enabled:
+        if name not in sections:
+            raise ValueError(f"Unknown report section: {name}")
+        section = sections[name]
+        source = sources[section['source']]
+        plan = plans.get(section['source'])
+        if plan is None:
+            plan = plans[section['source']] = {
+                'resource': source['resource'],
+                'fields': list(source.get('key_fields', ())),
+                'where': list(source.get('where', ())),
+                'order_by': source.get('order_by'),
+                'sections': [],
+            }
+
+        allowed = source.get('allowed')
+        for field in section['fields']:
+            if allowed is not None and field not in allowed:
+                raise ValueError(f"Section {name} asks {section['source']} for {field}, which the source does not allow")
+            if field not in plan['fields']:
+                plan['fields'].append(field)
+        plan['sections'].append(name)
+
+    for plan in plans.values():
+        plan['fields'].sort(key=field_kind)
+    return plans
+
+
+def build_query(plan, start_date, end_date):
+    """Write the GAQL query for a plan over a date span."""
+    select = ',\n            '.join(plan['fields'])
+    conditions = [f"segments.date BETWEEN '{start_date}' AND '{end_date}'"] + plan['where']
+    where = '\n            AND '.join(conditions)
+    order_by = f"\n        ORDER BY {plan['order_by']}" if plan.get('order_by') else ''
+    return f"""
+        SELECT
+            {select}
+        FROM {plan['resource']}
+        WHERE {where}{order_by}
+    """
+
+
+def plan_key(plan):
+    """Stable identifier of a plan's resource and field set, e.g. for cache keys."""
+    return f"{plan['resource']}:{','.join(sorted(plan['fields']))}"
@@ -0,0 +1,233 @@
+"""
+Robert Hebert Media - Adaptive Rate Limiting and Retries
+
+One limiter per upstream service (Google Ads, Secret Manager, SendGrid,
+GitHub), shared by every thread on the instance. Each limiter combines:
+
+- a token bucket capping the request rate,
+- an AIMD concurrency window: in-flight calls grow by one per window of
+  successes and halve whenever the service throttles us,
+- jittered exponential retries for transient failures, waiting at least as
+  long as any retry-after hint the service sent,
+- per-run usage counters (calls, retries, throttles, failures), with an
+  optional quota that stops a run before it burns the daily API budget.
+"""
+
+import os
+import time
+import random
+import threading
+
+
+RETRY_ATTEMPTS = int(os.environ.get('RETRY_ATTEMPTS', '5'))
+RETRY_BASE_SECONDS = float(os.environ.get('RETRY_BASE_SECONDS', '1'))
+RETRY_MAX_SECONDS = float(os.environ.get('RETRY_MAX_SECONDS', '30'))
+# A service asking us to wait longer than this fails the call instead, so
+# a run does not sleep through its own timeout.
+MAX_RETRY_AFTER_SECONDS = float(os.environ.get('MAX_RETRY_AFTER_SECONDS', '120'))
+
+# Requests/sec, burst size and maximum in-flight calls per service.
+# run_quota caps calls per run (0 = unlimited). Calls to a non-idempotent
+# service (sending an email) are only retried when the service throttled
+# them, since any other failure may have happened after the side effect.
+SERVICE_LIMITS = {
+    'google_ads': {'rate': 10, 'burst': 10, 'concurrency': 8,
+                   'run_quota': int(os.environ.get('GOOGLE_ADS_RUN_QUOTA', '0'))},
+    'secret_manager': {'rate': 50, 'burst': 20, 'concurrency': 10, 'run_quota': 0},
+    'sendgrid': {'rate': 10, 'burst': 10, 'concurrency': 4, 'run_quota': 0, 'idempotent': False},
+    'github': {'rate': 10, 'burst': 20, 'concurrency': 8, 'run_quota': 0},
+}
+
+# Exceptions (by class name, so no SDK has to be imported here) that are
+# worth retrying: google.api_core, requests and builtin network errors.
+TRANSIENT_ERRORS = {
+    'ResourceExhausted', 'TooManyRequests', 'ServiceUnavailable', 'DeadlineExceeded',
+    'InternalServerError', 'BadGateway', 'GatewayTimeout', 'Aborted',
+    'ConnectionError', 'ConnectTimeout', 'ReadTimeout', 'Timeout', 'ChunkedEncodingError',
+    'ConnectionResetError', 'TimeoutError',
+}
+THROTTLE_ERRORS = {'ResourceExhausted', 'TooManyRequests'}
+TRANSIENT_GRPC_CODES = {'RESOURCE_EXHAUSTED', 'UNAVAILABLE', 'DEADLINE_EXCEEDED', 'INTERNAL', 'ABORTED'}
+
+
+class QuotaExceeded(Exception):
+    """Raised when a run has used up its call quota for a service."""
+
+
+def _header(headers, name):
+    if not headers:
+        return None
+    try:
+        return headers.get(name) or headers.get(name.lower())
+    except AttributeError:
+        return None
+
+
+def _ads_retry_delay(error):
+    """Largest QuotaErrorDetails.retry_delay in a GoogleAdsException, if any."""
+    delays = []
+    for ads_error in getattr(getattr(error, 'failure', None), 'errors', None) or []:
+        try:
+            delay = ads_error.details.quota_error_details.retry_delay
+            delays.append(delay.seconds + delay.nanos / 1e9)
+        except AttributeError:
+            continue
+    return max(delays) if delays and max(delays) > 0 else None
+
+
+def classify_error(error):
+    """
+    Return (retryable, throttled, retry_after_seconds) for an exception.
+
+    Understands HTTP status codes and Retry-After headers (SendGrid, GitHub),
+    GoogleAdsException gRPC codes and quota retry delays, google.api_core
+    errors and network errors. Anything else is not retried.
+    """
+    retry_after = getattr(error, 'retry_after', None)
+    headers = getattr(error, 'headers', None)
+    if retry_after is None and _header(headers, 'Retry-After'):
+        try:
+            retry_after = float(_header(headers, 'Retry-After'))
+        except ValueError:
+            retry_after = None
+
+    status = getattr(error, 'status_code', None) or getattr(error, 'status', None)
+    if isinstance(status, int):
+        throttled = status == 429 or (status == 403 and retry_after is not None)
+        return throttled or status >= 500, throttled, retry_after
+
+    name = type(error).__name__
+    if name == 'GoogleAdsException':
+        try:
+            code = error.error.code().name
+        except AttributeError:
+            code = None
+        return code in TRANSIENT_GRPC_CODES, code == 'RESOURCE_EXHAUSTED', _ads_retry_delay(error)
+
+    if getattr(error, 'transient', False) or name in TRANSIENT_ERRORS:
+        return True, name in THROTTLE_ERRORS, retry_after
+
+    return False, False, None
+
+
+def backoff_delay(attempt, retry_after=None, base=RETRY_BASE_SECONDS, cap=RETRY_MAX_SECONDS):
+    """Full-jitter exponential backoff, never shorter than a retry-after hint."""
+    delay = random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+    return max(delay, retry_after or 0)
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens/sec, holding at most `burst`."""
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class AdaptiveLimiter:
+    """Rate limit, adaptive concurrency and retries for one upstream service."""
+
+    def __init__(self, service, rate, burst, concurrency, run_quota=0, idempotent=True, attempts=RETRY_ATTEMPTS):
+        self.service = service
+        self.idempotent = idempotent
+        self.bucket = TokenBucket(rate, burst)
+        self.max_concurrency = concurrency
+        self.limit = float(concurrency)
+        self.in_flight = 0
+        self.run_quota = run_quota
+        self.attempts = attempts
+        self._cond = threading.Condition()
+        self.reset_usage()
+
+    def reset_usage(self):
+        """Start counting a new run."""
+        with self._cond:
+            self.usage = {'calls': 0, 'retries': 0, 'throttled': 0, 'failures': 0}
+
+    def _enter(self):
+        with self._cond:
+            if self.run_quota and self.usage['calls'] >= self.run_quota:
+                raise QuotaExceeded(f"{self.service}: run quota of {self.run_quota} calls used up")
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+            self.usage['calls'] += 1
+
+    def _exit(self, throttled):
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.usage['throttled'] += 1
+                self.limit = max(1.0, self.limit / 2)
+            else:
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def call(self, fn, *args, **kwargs):
+        """Call fn under the limiter, retrying transient failures with backoff."""
+        for attempt in range(1, self.attempts + 1):
+            self.bucket.acquire()
+            self._enter()
+            throttled = False
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                retryable, throttled, retry_after = classify_error(e)
+                if not self.idempotent and not throttled:
+                    retryable = False
+                if retry_after and retry_after > MAX_RETRY_AFTER_SECONDS:
+                    retryable = False
+                if not retryable or attempt == self.attempts:
+                    with self._cond:
+                        self.usage['failures'] += 1
+                    raise
+            finally:
+                self._exit(throttled)
+
+            delay = backoff_delay(attempt, retry_after)
+            with self._cond:
+                self.usage['retries'] += 1
+            print(f"{self.service}: transient error, retry {attempt}/{self.attempts - 1} in {delay:.1f}s")
+            time.sleep(delay)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(service):
+    """Return the shared limiter for a service in SERVICE_LIMITS."""
+    limiter = _limiters.get(service)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(service)
+            if limiter is None:
+                limiter = _limiters[service] = AdaptiveLimiter(service, **SERVICE_LIMITS[service])
+    return limiter
+
+
+def reset_usage():
+    """Reset every limiter's per-run counters."""
+    for service in SERVICE_LIMITS:
+        get_limiter(service).reset_usage()
+
+
+def usage():
+    """Per-service usage counters for the current run."""
+    return {service: dict(get_limiter(service).usage) for service in SERVICE_LIMITS}
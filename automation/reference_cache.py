@@ -0,0 +1,126 @@
+"""
+Robert Hebert Media - Reference Data Cache
+
+SQLite cache of slowly changing Google Ads entities, so metrics queries
+only select ids and numbers and names are joined locally:
+
+- campaign metadata (name, status), per customer account,
+- geo target constant names, shared by every account (customer_id '').
+
+Each (customer, kind) pair remembers when it was last checked against the
+API. Callers decide what a stale entry costs: campaigns run a cheap change
+query before refetching, geo targets (which effectively never change) are
+simply refetched after a long TTL.
+
+The database lives under RHM_STATE_DIR next to the metrics store.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+
+
+STATE_DIR = os.environ.get('RHM_STATE_DIR', os.path.join(tempfile.gettempdir(), 'rhm-reports'))
+DEFAULT_CACHE_PATH = os.path.join(STATE_DIR, 'reference-cache.sqlite3')
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS reference_entities (
+        customer_id TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        entity_id TEXT NOT NULL,
+        attributes TEXT NOT NULL,
+        PRIMARY KEY (customer_id, kind, entity_id)
+    );
+    CREATE TABLE IF NOT EXISTS reference_checks (
+        customer_id TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        checked_at REAL NOT NULL,
+        PRIMARY KEY (customer_id, kind)
+    );
+"""
+
+# customer_id used for entities shared by every account.
+SHARED = ''
+
+
+class ReferenceCache:
+    """Per-customer reference entities ({entity id: attributes}) backed by one SQLite file."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, clock=time.time):
+        self.path = path
+        self.clock = clock
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection per call (safe across threads); commit on success."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, customer_id, kind, entity_ids=None):
+        """Return {entity id: attributes} for a kind, optionally only the given ids."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT entity_id, attributes FROM reference_entities WHERE customer_id = ? AND kind = ?",
+                (customer_id, kind)
+            ).fetchall()
+
+        entities = {entity_id: json.loads(attributes) for entity_id, attributes in rows}
+        if entity_ids is not None:
+            wanted = {str(entity_id) for entity_id in entity_ids}
+            entities = {entity_id: value for entity_id, value in entities.items() if entity_id in wanted}
+        return entities
+
+    def age(self, customer_id, kind):
+        """Seconds since the kind was last checked for a customer, or None if never."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT checked_at FROM reference_checks WHERE customer_id = ? AND kind = ?",
+                (customer_id, kind)
+            ).fetchone()
+        return None if row is None else self.clock() - row[0]
+
+    def replace(self, customer_id, kind, entities):
+        """Store the complete set of entities of a kind for a customer and mark it checked."""
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM reference_entities WHERE customer_id = ? AND kind = ?",
+                (customer_id, kind)
+            )
+            self._upsert(conn, customer_id, kind, entities)
+            self._mark_checked(conn, customer_id, kind)
+
+    def update(self, customer_id, kind, entities):
+        """Add or refresh some entities of a kind, keeping the others."""
+        with self._connect() as conn:
+            self._upsert(conn, customer_id, kind, entities)
+
+    def touch(self, customer_id, kind):
+        """Mark a kind as checked now without changing its entities."""
+        with self._connect() as conn:
+            self._mark_checked(conn, customer_id, kind)
+
+    def _upsert(self, conn, customer_id, kind, entities):
+        conn.executemany(
+            "INSERT OR REPLACE INTO reference_entities (customer_id, kind, entity_id, attributes) "
+            "VALUES (?, ?, ?, ?)",
+            (
+                (customer_id, kind, str(entity_id), json.dumps(attributes, sort_keys=True))
+                for entity_id, attributes in entities.items()
+            )
+        )
+
+    def _mark_checked(self, conn, customer_id, kind):
+        conn.execute(
+            "INSERT OR REPLACE INTO reference_checks (customer_id, kind, checked_at) VALUES (?, ?, ?)",
+            (customer_id, kind, self.clock())
+        )
@@ -0,0 +1,170 @@
+"""
+Robert Hebert Media - Run Ledger
+
+SQLite checkpoint of which pipeline stages each client has finished in a
+run. A run is keyed by its mode and report folder (e.g. 'report:oct5-11'),
+so an invocation that times out or crashes can be re-triggered and pick up
+where it stopped: published reports are not rebuilt and clients that were
+already emailed are not emailed again. That only holds for retries that see
+the same database, so RHM_STATE_DIR must be storage every instance shares;
+the default temp dir is local to one instance.
+
+It also keeps how long each client's stages took, across runs, which the
+scheduler uses to predict runtimes.
+
+The database lives under RHM_STATE_DIR next to the metrics store.
+"""
+
+import os
+import json
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+
+
+STATE_DIR = os.environ.get('RHM_STATE_DIR', os.path.join(tempfile.gettempdir(), 'rhm-reports'))
+DEFAULT_LEDGER_PATH = os.path.join(STATE_DIR, 'run-ledger.sqlite3')
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS run_stages (
+        run_key TEXT NOT NULL,
+        client TEXT NOT NULL,
+        stage TEXT NOT NULL,
+        status TEXT NOT NULL,
+        detail TEXT,
+        updated_at TEXT NOT NULL,
+        PRIMARY KEY (run_key, client, stage)
+    );
+    CREATE TABLE IF NOT EXISTS stage_timings (
+        client TEXT NOT NULL,
+        stage TEXT NOT NULL,
+        seconds REAL NOT NULL,
+        recorded_at TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS stage_timings_client ON stage_timings (client, stage, recorded_at);
+"""
+
+# Timings kept per client and stage; older ones are pruned as new ones land.
+TIMINGS_KEPT = 20
+
+# A stage is 'started' once claimed and 'done' once its result is recorded.
+STARTED = 'started'
+DONE = 'done'
+
+
+class RunLedger:
+    """Per-run, per-client stage checkpoints backed by one SQLite file."""
+
+    def __init__(self, path=DEFAULT_LEDGER_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection per call (safe across threads); commit on success."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def stages(self, run_key):
+        """
+        Return {client: {stage: {'status', 'detail'}}} for a run.
+        `detail` is whatever was recorded with the stage (decoded JSON).
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT client, stage, status, detail FROM run_stages WHERE run_key = ?",
+                (run_key,)
+            ).fetchall()
+
+        progress = {}
+        for client, stage, status, detail in rows:
+            progress.setdefault(client, {})[stage] = {
+                'status': status,
+                'detail': json.loads(detail) if detail else None,
+            }
+        return progress
+
+    def record(self, run_key, client, stage, detail=None):
+        """Mark a stage as done for a client, with an optional JSON-able result."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO run_stages (run_key, client, stage, status, detail, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (run_key, client, stage, DONE, json.dumps(detail) if detail is not None else None,
+                 datetime.now().isoformat(timespec='seconds'))
+            )
+
+    def claim(self, run_key, client, stage):
+        """
+        Atomically mark a stage as started. Returns False if it was already
+        started or done, in this or another invocation.
+
+        Used for side effects that must happen at most once (emails): claim
+        first, then act, then record().
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO run_stages (run_key, client, stage, status, detail, updated_at) "
+                "VALUES (?, ?, ?, ?, NULL, ?)",
+                (run_key, client, stage, STARTED, datetime.now().isoformat(timespec='seconds'))
+            )
+            return cursor.rowcount == 1
+
+    def release(self, run_key, client, stage):
+        """Drop an unfinished claim, e.g. when the action is known to have failed."""
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM run_stages WHERE run_key = ? AND client = ? AND stage = ? AND status = ?",
+                (run_key, client, stage, STARTED)
+            )
+
+    def reset(self, run_key, clients=None):
+        """
+        Forget the checkpoints of a run so it starts from scratch, either
+        for every client or only for the given client slugs.
+        """
+        with self._connect() as conn:
+            if clients is None:
+                conn.execute("DELETE FROM run_stages WHERE run_key = ?", (run_key,))
+            else:
+                conn.executemany(
+                    "DELETE FROM run_stages WHERE run_key = ? AND client = ?",
+                    ((run_key, client) for client in clients)
+                )
+
+    def record_timing(self, client, stage, seconds):
+        """Remember how long a client's stage took, keeping its last TIMINGS_KEPT."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO stage_timings (client, stage, seconds, recorded_at) VALUES (?, ?, ?, ?)",
+                (client, stage, seconds, datetime.now().isoformat(timespec='seconds'))
+            )
+            conn.execute(
+                "DELETE FROM stage_timings WHERE client = ? AND stage = ? AND rowid NOT IN ("
+                "SELECT rowid FROM stage_timings WHERE client = ? AND stage = ? "
+                "ORDER BY recorded_at DESC, rowid DESC LIMIT ?)",
+                (client, stage, client, stage, TIMINGS_KEPT)
+            )
+
+    def recent_timings(self, last_runs=5):
+        """Return {client: {stage: mean seconds}} over each stage's last `last_runs` timings."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT client, stage, AVG(seconds) FROM ("
+                "SELECT client, stage, seconds, ROW_NUMBER() OVER ("
+                "PARTITION BY client, stage ORDER BY recorded_at DESC, rowid DESC) AS run "
+                "FROM stage_timings) WHERE run <= ? GROUP BY client, stage",
+                (last_runs,)
+            ).fetchall()
+
+        timings = {}
+        for client, stage, seconds in rows:
+            timings.setdefault(client, {})[stage] = seconds
+        return timings
@@ -0,0 +1,72 @@
+"""
+Robert Hebert Media - Deadline-Aware Client Scheduling
+
+Orders clients so the slowest accounts start first (longest-processing-time
+first), using stage durations recorded by earlier runs, and tracks the
+invocation's time budget so clients that cannot finish before the Cloud
+Function timeout are left unstarted and handed to a follow-up invocation.
+"""
+
+import os
+import time
+import threading
+
+
+# Matches --timeout in deploy.sh.
+FUNCTION_TIMEOUT_SECONDS = float(os.environ.get('FUNCTION_TIMEOUT_SECONDS', '540'))
+# Kept free at the end of a run for the shared commit, emails and hand-off.
+DEADLINE_RESERVE_SECONDS = float(os.environ.get('DEADLINE_RESERVE_SECONDS', '90'))
+# Prediction for a client with no recorded runs.
+DEFAULT_CLIENT_SECONDS = float(os.environ.get('DEFAULT_CLIENT_SECONDS', '30'))
+
+
+def predict_durations(clients, timings, default=DEFAULT_CLIENT_SECONDS):
+    """
+    Predict seconds per client slug from recorded stage timings.
+
+    `timings` is {slug: {stage: average seconds}} (see
+    RunLedger.recent_timings); a client's prediction is the sum of its
+    stage averages, or `default` when it has none.
+    """
+    return {
+        client['slug']: sum(timings.get(client['slug'], {}).values()) or default
+        for client in clients
+    }
+
+
+def longest_first(clients, predictions):
+    """Return clients ordered by predicted duration, slowest first (stable)."""
+    return sorted(clients, key=lambda client: -predictions.get(client['slug'], 0))
+
+
+class Deadline:
+    """Time budget of one invocation, measured from when it started."""
+
+    def __init__(self, budget_seconds=FUNCTION_TIMEOUT_SECONDS, reserve_seconds=DEADLINE_RESERVE_SECONDS,
+                 started=None):
+        self.budget_seconds = budget_seconds
+        self.reserve_seconds = reserve_seconds
+        self.started = time.monotonic() if started is None else started
+        # Set once any work has been started under this deadline.
+        self.started_work = False
+        self._lock = threading.Lock()
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def remaining(self):
+        """Seconds left before the reserve at the end of the budget."""
+        return self.budget_seconds - self.reserve_seconds - self.elapsed()
+
+    def can_start(self, predicted_seconds):
+        """
+        True if work predicted to take `predicted_seconds` still fits, and
+        counts it as started. The first work asked about always starts, so
+        a client predicted to need more than a whole invocation is run
+        (it is first in longest-first order) rather than handed off forever.
+        """
+        with self._lock:
+            if self.started_work and predicted_seconds > self.remaining():
+                return False
+            self.started_work = True
+            return True
@@ -0,0 +1,41 @@
+"""
+Robert Hebert Media - Breakdown Tests
+
+Top-K terms ranked by spend and by conversions from one pass over the rows.
+"""
+
+from types import SimpleNamespace
+
+from breakdowns import TermRankings, TopK
+
+
+def make_row(term, cost_micros, conversions):
+    metrics = SimpleNamespace(impressions=100, clicks=10, cost_micros=cost_micros, conversions=conversions)
+    return SimpleNamespace(term=term, metrics=metrics)
+
+
+ROWS = [
+    make_row('costly', 9_000_000, 0.0),
+    make_row('steady', 5_000_000, 2.0),
+    make_row('cheap lead', 1_000_000, 6.0),
+    make_row('steady', 1_000_000, 1.0),
+]
+
+
+def test_rankings_by_spend_and_by_conversions_from_one_pass():
+    rankings = TermRankings(2).add_rows(ROWS, lambda row: row.term).result()
+
+    by_spend, spend_other = rankings['cost_micros']
+    by_conversions, conversions_other = rankings['conversions']
+    assert [row['term'] for row in by_spend] == ['costly', 'steady']
+    assert [row['term'] for row in by_conversions] == ['cheap lead', 'steady']
+    assert by_conversions[1]['conversions'] == 3.0
+    assert spend_other['cost_micros'] == 1_000_000
+    assert conversions_other['cost_micros'] == 9_000_000
+
+
+def test_each_ranking_matches_a_single_top_k():
+    rankings = TermRankings(2).add_rows(ROWS, lambda row: row.term).result()
+
+    for metric in ('cost_micros', 'conversions'):
+        assert rankings[metric] == TopK(2, metric).add_rows(ROWS, lambda row: row.term).result()
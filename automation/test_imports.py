@@ -0,0 +1,22 @@
+"""
+Robert Hebert Media - Import Tests
+
+`import main` in a fresh interpreter must not load the heavy SDKs; they are
+imported on first use so cold starts stay short.
+"""
+
+from benchmarks import eager_heavy_modules, import_times
+
+
+def test_import_main_loads_no_heavy_module():
+    entries = import_times('main')
+
+    assert any(depth == 0 and name == 'main' for depth, name, _ in entries)
+    assert eager_heavy_modules(entries) == []
+
+
+def test_eager_heavy_modules_matches_packages_and_submodules():
+    entries = [(1, 'yaml', 0.01), (2, 'google.ads.googleads.client', 0.2), (1, 'yamlish', 0.0)]
+
+    assert eager_heavy_modules(entries) == ['google.ads.googleads', 'yaml']
+    assert eager_heavy_modules([]) == []
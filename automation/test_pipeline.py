@@ -0,0 +1,179 @@
+"""
+Robert Hebert Media - Pipeline Tests
+
+Stage gates of the client pipeline, backfill spans and the restatement
+republish decision.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+import main
+from metrics_frame import MetricsFrame
+from metrics_store import MetricsStore, changed_dates, date_span
+from scheduling import Deadline
+
+
+def acquired(semaphore):
+    """Count how many times `semaphore` can be acquired without blocking."""
+    count = 0
+    while semaphore.acquire(blocking=False):
+        count += 1
+    return count
+
+
+# ============================================================================
+# STAGE GATES
+# ============================================================================
+
+def test_each_stage_has_its_own_limit_capped_at_workers():
+    gates = main.make_stage_gates(4, {'fetch': 8, 'render': 1, 'publish': 1, 'notify': 2})
+
+    assert {stage: acquired(gate) for stage, gate in gates.items()} == {
+        'fetch': 4, 'render': 1, 'publish': 1, 'notify': 2
+    }
+
+
+def test_default_limits_bound_render_and_publish_below_the_workers():
+    gates = main.make_stage_gates(4)
+
+    assert acquired(gates['render']) == main.STAGE_LIMITS['render'] == 1
+    assert acquired(gates['publish']) == main.STAGE_LIMITS['publish'] == 1
+
+
+# ============================================================================
+# BACKFILL
+# ============================================================================
+
+def test_backfill_windows_cover_each_week_of_the_span():
+    windows = main.get_backfill_windows('2026-03-02', '2026-03-15')
+
+    assert [date_range['folder_name'] for date_range, _ in windows] == ['mar2-8', 'mar9-15']
+
+
+@pytest.mark.parametrize('start_date, end_date, message', [
+    (None, '2026-03-15', 'start_date is required'),
+    ('2026-03-02', '15/03/2026', 'Invalid end_date'),
+    ('2026-03-15', '2026-03-02', 'is after end_date'),
+    ('2024-01-01', '2026-03-15', 'at most 366 days'),
+])
+def test_invalid_backfill_spans_are_rejected(start_date, end_date, message):
+    with pytest.raises(ValueError, match=message):
+        main.get_backfill_windows(start_date, end_date)
+
+
+def test_backfill_request_with_a_bad_date_gets_a_400(monkeypatch):
+    monkeypatch.setattr(main, 'load_clients_config', lambda: {'clients': []})
+    monkeypatch.setattr(main, 'prefetch_secrets', lambda: None)
+
+    class Request:
+        args = {'mode': 'backfill', 'start_date': '2026-03-02'}
+
+    body, status = main.generate_weekly_reports(Request())
+
+    assert status == 400
+    assert 'end_date is required' in body['error']
+
+
+def test_backfill_past_the_deadline_defers_instead_of_fetching(monkeypatch):
+    def fetch(*args):
+        raise AssertionError('fetched after the deadline')
+
+    monkeypatch.setattr(main, 'get_customer_account', lambda *args, **kwargs: None)
+    monkeypatch.setattr(main, 'fetch_google_ads_span', fetch)
+    monkeypatch.setattr(main, 'publish_staged', lambda results, message, batch: True)
+    deadline = Deadline(budget_seconds=540, reserve_seconds=90)
+    deadline.started -= 500
+    deadline.started_work = True
+    client = {'name': 'Client', 'slug': 'client', 'customer_id': '1'}
+
+    results = main.run_backfill([client], '2026-03-02', '2026-03-15', deadline=deadline)
+
+    assert [(result['folder'], result['status']) for result in results] == [
+        ('mar2-8', 'deferred'), ('mar9-15', 'deferred')
+    ]
+
+
+# ============================================================================
+# RESTATEMENT
+# ============================================================================
+
+WINDOW = ('2026-03-02', '2026-03-15')
+
+
+def make_frame(conversions, status='ENABLED'):
+    """Frame with one campaign/device row per date in {date: conversions}."""
+    return MetricsFrame.from_records(
+        {'campaign': '101', 'status': status, 'date': date, 'device': 'MOBILE',
+         'impressions': 100, 'clicks': 10, 'cost_micros': 5_000_000, 'conversions': value}
+        for date, value in conversions.items()
+    )
+
+
+def window_conversions(overrides=None):
+    """One conversion per day of WINDOW, except the dates in `overrides`."""
+    conversions = dict.fromkeys(date_span(*WINDOW), 1.0)
+    conversions.update(overrides or {})
+    return conversions
+
+
+def test_changed_dates_compares_each_day_but_not_campaign_status():
+    old = make_frame({'2026-03-02': 1.0, '2026-03-03': 1.0})
+
+    assert changed_dates(old, make_frame({'2026-03-02': 1.0, '2026-03-03': 1.0})) == []
+    assert changed_dates(old, make_frame({'2026-03-02': 1.0, '2026-03-03': 2.0})) == ['2026-03-03']
+    assert changed_dates(old, make_frame({'2026-03-02': 1.0, '2026-03-03': 1.0, '2026-03-04': 1.0})) == ['2026-03-04']
+    assert changed_dates(old, make_frame({'2026-03-02': 1.0, '2026-03-03': 1.0}, status='PAUSED')) == []
+
+
+@pytest.fixture
+def restatement(monkeypatch, tmp_path):
+    """Run restate_client against a real store with `fresh` as the API's answer."""
+    store = MetricsStore(str(tmp_path / 'metrics.sqlite3'))
+    republished = []
+    account = SimpleNamespace(customer_id='1234567890')
+    monkeypatch.setattr(main, 'get_customer_account', lambda *args, **kwargs: account)
+    monkeypatch.setattr(main, 'fetch_current_and_previous', lambda *args, **kwargs: (None, None))
+    monkeypatch.setattr(main, 'fetch_report_breakdowns', lambda *args: {})
+    monkeypatch.setattr(main, 'render_stage', lambda *args: '<html></html>')
+    monkeypatch.setattr(main, 'publish_stage',
+                        lambda client, html, date_range, batch: republished.append(date_range['folder_name']))
+
+    def restate(fresh):
+        monkeypatch.setattr(main, 'fetch_google_ads_frame', lambda *args: fresh)
+        republished.clear()
+        client = {'name': 'Client', 'slug': 'client', 'customer_id': account.customer_id}
+        result = main.restate_client(client, *WINDOW, {'end_date': WINDOW[1]}, store,
+                                     main.make_stage_gates(1), None)
+        return result['changed_dates'], list(republished)
+
+    return store, account, restate
+
+
+def test_unchanged_window_republishes_nothing(restatement):
+    store, account, restate = restatement
+    store.save_frame(account.customer_id, make_frame(window_conversions()), *WINDOW)
+
+    assert restate(make_frame(window_conversions())) == ([], [])
+    assert restate(make_frame(window_conversions(), status='PAUSED')) == ([], [])
+
+
+def test_changed_day_republishes_its_week_and_the_next(restatement):
+    store, account, restate = restatement
+    store.save_frame(account.customer_id, make_frame(window_conversions()), *WINDOW)
+
+    changed, republished = restate(make_frame(window_conversions({'2026-03-04': 3.0})))
+
+    assert changed == ['2026-03-04']
+    assert republished == ['mar2-8', 'mar9-15']
+    assert restate(make_frame(window_conversions({'2026-03-04': 3.0}))) == ([], [])
+
+
+def test_new_days_are_stored_but_not_restated(restatement):
+    store, account, restate = restatement
+    first_week = {date: 1.0 for date in date_span('2026-03-02', '2026-03-08')}
+    store.save_frame(account.customer_id, make_frame(first_week), '2026-03-02', '2026-03-08')
+
+    assert restate(make_frame(window_conversions())) == ([], [])
+    assert store.fetched_dates(account.customer_id, *WINDOW) == set(date_span(*WINDOW))
@@ -0,0 +1,213 @@
+"""
+Robert Hebert Media - Publisher Tests
+
+GitHubApiPublisher against a local http.server stand-in for the GitHub Git
+Data API (blobs, trees, commits and refs).
+"""
+
+import json
+import base64
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from publisher import GitHubApiPublisher, PublishConflict, PublishManifest, Publisher
+
+
+# ============================================================================
+# LOCAL GIT DATA API
+# ============================================================================
+
+class FakeGitHub:
+    """Branch state and the requests received, shared with the handler."""
+
+    def __init__(self):
+        self.head = 'commit-0'
+        # Text of files on the branch, served by the contents API.
+        self.contents = {}
+        self.requests = []
+        # PATCHes of the branch ref to answer with 422 before accepting one.
+        self.rejected_ref_updates = 0
+        self.lock = threading.Lock()
+
+    def calls(self, method, prefix):
+        return [body for seen_method, path, body in self.requests if seen_method == method and path.startswith(prefix)]
+
+
+def make_handler(github):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status, body):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _handle(self, method):
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length) or b'{}')
+            path, _, _ = self.path.split('/repos/owner/reports/', 1)[1].partition('?')
+
+            with github.lock:
+                github.requests.append((method, path, body))
+                count = len(github.requests)
+
+                if method == 'GET' and path == 'git/ref/heads/main':
+                    return self._reply(200, {'object': {'sha': github.head}})
+                if method == 'GET' and path.startswith('contents/'):
+                    content = github.contents.get(path[len('contents/'):])
+                    if content is None:
+                        return self._reply(404, {'message': 'Not Found'})
+                    encoded = base64.b64encode(content.encode('utf-8')).decode('ascii')
+                    return self._reply(200, {'content': encoded, 'encoding': 'base64'})
+                if method == 'GET' and path.startswith('git/commits/'):
+                    return self._reply(200, {'tree': {'sha': f"tree-of-{path.rsplit('/', 1)[1]}"}})
+                if method == 'POST' and path == 'git/blobs':
+                    return self._reply(201, {'sha': f'blob-{count}'})
+                if method == 'POST' and path == 'git/trees':
+                    return self._reply(201, {'sha': f'tree-{count}'})
+                if method == 'POST' and path == 'git/commits':
+                    return self._reply(201, {'sha': f'commit-{count}'})
+                if method == 'PATCH' and path == 'git/refs/heads/main':
+                    if github.rejected_ref_updates:
+                        github.rejected_ref_updates -= 1
+                        # Another producer moved the branch in the meantime.
+                        github.head = f'commit-other-{count}'
+                        github.contents['index.html'] = github.contents.get('index.html', '') + '<other>'
+                        return self._reply(422, {'message': 'Update is not a fast forward'})
+                    github.head = body['sha']
+                    return self._reply(200, {'object': {'sha': github.head}})
+            self._reply(404, {'message': 'Not Found'})
+
+        def do_GET(self):
+            self._handle('GET')
+
+        def do_POST(self):
+            self._handle('POST')
+
+        def do_PATCH(self):
+            self._handle('PATCH')
+
+    return Handler
+
+
+@pytest.fixture
+def github():
+    state = FakeGitHub()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(state))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    state.url = f"http://127.0.0.1:{server.server_port}"
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+def make_publisher(github, manifest=None, max_attempts=3):
+    return GitHubApiPublisher('owner/reports', lambda: 'token', api_url=github.url,
+                              max_attempts=max_attempts, manifest=manifest)
+
+
+# ============================================================================
+# TESTS
+# ============================================================================
+
+def test_publish_creates_one_blob_per_file_one_tree_one_commit(github):
+    files = {'a-oct5-11/index.html': '<p>a</p>', 'b-oct5-11/index.html': '<p>b</p>'}
+
+    published = make_publisher(github).publish(files, 'Add reports')
+
+    assert published == sorted(files)
+    assert sorted(blob['content'] for blob in github.calls('POST', 'git/blobs')) == sorted(files.values())
+    trees = github.calls('POST', 'git/trees')
+    assert len(trees) == 1
+    assert trees[0]['base_tree'] == 'tree-of-commit-0'
+    assert sorted(entry['path'] for entry in trees[0]['tree']) == sorted(files)
+    commits = github.calls('POST', 'git/commits')
+    assert len(commits) == 1
+    assert commits[0]['parents'] == ['commit-0']
+    ref_updates = github.calls('PATCH', 'git/refs/heads/main')
+    assert len(ref_updates) == 1
+    assert ref_updates[0]['force'] is False
+    assert github.head == ref_updates[0]['sha']
+
+
+def test_unchanged_files_are_skipped_through_the_manifest(github, tmp_path):
+    manifest = PublishManifest(str(tmp_path / 'manifest.json'))
+    publisher = make_publisher(github, manifest)
+    publisher.publish({'a/index.html': 'same', 'b/index.html': 'old'}, 'First run')
+    github.requests.clear()
+
+    published = publisher.publish({'a/index.html': 'same', 'b/index.html': 'new'}, 'Second run')
+
+    assert published == ['b/index.html']
+    assert [blob['content'] for blob in github.calls('POST', 'git/blobs')] == ['new']
+
+    github.requests.clear()
+    assert publisher.publish({'a/index.html': 'same', 'b/index.html': 'new'}, 'Third run') == []
+    assert github.requests == []
+
+
+def test_rejected_ref_update_is_retried_on_the_new_head(github):
+    github.rejected_ref_updates = 1
+
+    published = make_publisher(github).publish({'a/index.html': 'a'}, 'Add report')
+
+    assert published == ['a/index.html']
+    # Blobs are uploaded once; tree, commit and ref update are redone.
+    assert len(github.calls('POST', 'git/blobs')) == 1
+    assert len(github.calls('POST', 'git/trees')) == 2
+    commits = github.calls('POST', 'git/commits')
+    assert len(commits) == 2
+    assert commits[1]['parents'][0].startswith('commit-other-')
+    assert len(github.calls('PATCH', 'git/refs/heads/main')) == 2
+
+
+def test_ref_update_rejected_on_every_attempt_raises_publish_conflict(github):
+    github.rejected_ref_updates = 2
+
+    with pytest.raises(PublishConflict):
+        make_publisher(github, max_attempts=2).publish({'a/index.html': 'a'}, 'Add report')
+
+    assert len(github.calls('PATCH', 'git/refs/heads/main')) == 2
+
+
+def test_publisher_without_publish_files_cannot_be_created():
+    class Incomplete(Publisher):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_updates_are_applied_to_the_head_each_attempt_commits_onto(github):
+    github.contents['index.html'] = '<index>'
+    github.rejected_ref_updates = 1
+
+    published = make_publisher(github).publish(
+        {'a/index.html': 'a'}, 'Add report', {'index.html': lambda content: content + '<a>'}
+    )
+
+    assert published == ['a/index.html', 'index.html']
+    # The retry rebuilds index.html from the other producer's copy.
+    assert [blob['content'] for blob in github.calls('POST', 'git/blobs')] == [
+        'a', '<index><a>', '<index><other><a>'
+    ]
+    tree = github.calls('POST', 'git/trees')[-1]['tree']
+    assert sorted(entry['path'] for entry in tree) == ['a/index.html', 'index.html']
+
+
+def test_update_of_a_missing_file_gets_none(github):
+    seen = []
+
+    make_publisher(github).publish({}, 'Add index', {'index.html': lambda content: seen.append(content) or 'new'})
+
+    assert seen == [None]
+    assert [blob['content'] for blob in github.calls('POST', 'git/blobs')] == ['new']
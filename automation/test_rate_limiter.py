@@ -0,0 +1,211 @@
+"""
+Robert Hebert Media - Rate Limiter Tests
+
+Error classification, the token bucket, AIMD concurrency, retries, run
+quotas, and which part of a Google Ads query the limiter wraps.
+"""
+
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import main
+import rate_limiter
+from rate_limiter import AdaptiveLimiter, QuotaExceeded, TokenBucket, classify_error
+
+
+class HttpError(Exception):
+    def __init__(self, status, headers=None):
+        super().__init__(f"HTTP {status}")
+        self.status_code = status
+        self.headers = headers or {}
+
+
+class GoogleAdsException(Exception):
+    """Stand-in with the attributes classify_error reads from the real one."""
+
+    def __init__(self, code, retry_seconds=0):
+        super().__init__(code)
+        self.error = SimpleNamespace(code=lambda: SimpleNamespace(name=code))
+        delay = SimpleNamespace(seconds=retry_seconds, nanos=0)
+        details = SimpleNamespace(quota_error_details=SimpleNamespace(retry_delay=delay))
+        self.failure = SimpleNamespace(errors=[SimpleNamespace(details=details)])
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(rate_limiter, 'backoff_delay', lambda attempt, retry_after=None: 0)
+
+
+def make_limiter(**kwargs):
+    options = {'rate': 1000, 'burst': 1000, 'concurrency': 8}
+    options.update(kwargs)
+    return AdaptiveLimiter('test', **options)
+
+
+def failing(errors, result='ok'):
+    """fn that raises each of `errors` in turn, then returns `result`."""
+    errors = list(errors)
+
+    def fn():
+        if errors:
+            raise errors.pop(0)
+        return result
+    return fn
+
+
+# ============================================================================
+# CLASSIFICATION
+# ============================================================================
+
+@pytest.mark.parametrize('error, expected', [
+    (HttpError(429, {'Retry-After': '3'}), (True, True, 3.0)),
+    (HttpError(503), (True, False, None)),
+    (HttpError(403, {'Retry-After': '10'}), (True, True, 10.0)),
+    (HttpError(403), (False, False, None)),
+    (HttpError(404), (False, False, None)),
+    (GoogleAdsException('RESOURCE_EXHAUSTED', retry_seconds=7), (True, True, 7.0)),
+    (GoogleAdsException('UNAVAILABLE'), (True, False, None)),
+    (GoogleAdsException('INVALID_ARGUMENT'), (False, False, None)),
+    (ConnectionResetError(), (True, False, None)),
+    (ValueError('bad query'), (False, False, None)),
+])
+def test_classify_error(error, expected):
+    assert classify_error(error) == expected
+
+
+# ============================================================================
+# TOKEN BUCKET
+# ============================================================================
+
+def test_token_bucket_refills_at_its_rate_up_to_the_burst():
+    bucket = TokenBucket(rate=10, burst=5)
+    bucket.tokens = 0
+    bucket.updated = time.monotonic() - 0.3
+
+    bucket.acquire()
+    assert 1.9 <= bucket.tokens <= 2.5
+
+    bucket.updated = time.monotonic() - 60
+    bucket.acquire()
+    assert 3.9 <= bucket.tokens <= 4.0
+
+
+def test_empty_token_bucket_waits_for_a_token():
+    bucket = TokenBucket(rate=20, burst=1)
+    bucket.acquire()
+
+    started = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - started >= 0.04
+
+
+# ============================================================================
+# AIMD CONCURRENCY AND RETRIES
+# ============================================================================
+
+def test_throttling_halves_the_window_and_successes_grow_it_back():
+    limiter = make_limiter(concurrency=8, attempts=1)
+
+    with pytest.raises(HttpError):
+        limiter.call(failing([HttpError(429)]))
+    assert limiter.limit == 4.0
+    assert limiter.usage['throttled'] == 1
+
+    for _ in range(4):
+        limiter.call(failing([]))
+    assert 4.0 < limiter.limit < 5.0
+
+    for _ in range(100):
+        limiter.call(failing([]))
+    assert limiter.limit == 8.0
+
+
+def test_transient_errors_are_retried_and_counted():
+    limiter = make_limiter(attempts=3)
+
+    assert limiter.call(failing([HttpError(503), ConnectionResetError()])) == 'ok'
+    assert limiter.usage == {'calls': 3, 'retries': 2, 'throttled': 0, 'failures': 0}
+
+    with pytest.raises(HttpError):
+        limiter.call(failing([HttpError(503)] * 3))
+    assert limiter.usage['failures'] == 1
+
+
+def test_non_idempotent_calls_are_only_retried_when_throttled():
+    limiter = make_limiter(idempotent=False, attempts=3)
+
+    with pytest.raises(HttpError):
+        limiter.call(failing([HttpError(500)]))
+    assert limiter.call(failing([HttpError(429)])) == 'ok'
+    assert limiter.usage['retries'] == 1
+
+
+def test_run_quota_stops_calls_until_usage_is_reset():
+    limiter = make_limiter(run_quota=2)
+    limiter.call(failing([]))
+    limiter.call(failing([]))
+
+    with pytest.raises(QuotaExceeded):
+        limiter.call(failing([]))
+
+    limiter.reset_usage()
+    assert limiter.call(failing([])) == 'ok'
+
+
+# ============================================================================
+# GOOGLE ADS QUERIES
+# ============================================================================
+
+class FakeAccount:
+    """search() fails with each of `errors` in turn, then yields `rows`, raising `broken` after them."""
+
+    def __init__(self, rows, errors=(), broken=None):
+        self.rows = rows
+        self.errors = list(errors)
+        self.broken = broken
+        self.searches = 0
+
+    def search(self, query):
+        self.searches += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return self._rows()
+
+    def _rows(self):
+        yield from self.rows
+        if self.broken:
+            raise self.broken
+
+
+@pytest.fixture
+def ads_limiter(monkeypatch):
+    limiter = make_limiter(attempts=3)
+    monkeypatch.setattr(main, 'get_limiter', lambda service: limiter)
+    return limiter
+
+
+def test_query_errors_before_the_first_row_are_retried(ads_limiter):
+    account = FakeAccount([1, 2, 3], errors=[GoogleAdsException('UNAVAILABLE')])
+    accumulated = []
+
+    result = main.run_report_query(account, 'SELECT', 'search', lambda rows: accumulated.append(1) or sum(rows))
+
+    assert result == 6
+    assert account.searches == 2
+    assert accumulated == [1]
+
+
+def test_a_stream_that_breaks_partway_is_not_rerun(ads_limiter):
+    account = FakeAccount([1, 2], broken=ConnectionResetError())
+
+    with pytest.raises(ConnectionResetError):
+        main.run_report_query(account, 'SELECT', 'search', sum)
+
+    assert account.searches == 1
+    assert ads_limiter.usage['calls'] == 1
+
+
+def test_empty_results_are_accumulated(ads_limiter):
+    assert main.run_report_query(FakeAccount([]), 'SELECT', 'search', list) == []
@@ -0,0 +1,45 @@
+"""
+Robert Hebert Media - Run Ledger Tests
+
+Stage checkpoints, the at-most-once claim and the bounded stage timings.
+"""
+
+import run_ledger
+from run_ledger import RunLedger
+
+
+def make_ledger(tmp_path):
+    return RunLedger(str(tmp_path / 'run-ledger.sqlite3'))
+
+
+def test_a_stage_can_only_be_claimed_once_until_released(tmp_path):
+    ledger = make_ledger(tmp_path)
+
+    assert ledger.claim('report:mar2-8', 'client', 'notify')
+    assert not ledger.claim('report:mar2-8', 'client', 'notify')
+    ledger.release('report:mar2-8', 'client', 'notify')
+    assert ledger.claim('report:mar2-8', 'client', 'notify')
+    ledger.record('report:mar2-8', 'client', 'notify')
+    ledger.release('report:mar2-8', 'client', 'notify')
+    assert not ledger.claim('report:mar2-8', 'client', 'notify')
+
+
+def test_recent_timings_average_each_stage_over_its_last_runs(tmp_path):
+    ledger = make_ledger(tmp_path)
+    for seconds in (100, 1, 2, 3):
+        ledger.record_timing('client', 'fetch', seconds)
+    ledger.record_timing('client', 'render', 4)
+
+    assert ledger.recent_timings(last_runs=3) == {'client': {'fetch': 2.0, 'render': 4.0}}
+
+
+def test_old_timings_are_pruned(tmp_path, monkeypatch):
+    monkeypatch.setattr(run_ledger, 'TIMINGS_KEPT', 3)
+    ledger = make_ledger(tmp_path)
+    for seconds in range(10):
+        ledger.record_timing('client', 'fetch', seconds)
+    ledger.record_timing('other', 'fetch', 50)
+
+    with ledger._connect() as conn:
+        rows = conn.execute("SELECT client, seconds FROM stage_timings ORDER BY rowid").fetchall()
+    assert rows == [('client', 7.0), ('client', 8.0), ('client', 9.0), ('other', 50.0)]
@@ -0,0 +1,57 @@
+"""
+Robert Hebert Media - Scheduling Tests
+
+Longest-first ordering and the invocation deadline, including clients
+predicted to need more than a whole invocation.
+"""
+
+import main
+from scheduling import Deadline, longest_first, predict_durations
+
+
+def make_deadline(elapsed=0.0):
+    deadline = Deadline(budget_seconds=540, reserve_seconds=90)
+    deadline.started -= elapsed
+    return deadline
+
+
+def test_predictions_sum_stage_timings_and_order_slowest_first():
+    clients = [{'slug': 'fast'}, {'slug': 'slow'}, {'slug': 'new'}]
+    timings = {'fast': {'fetch': 2.0, 'render': 1.0}, 'slow': {'fetch': 500.0, 'render': 20.0}}
+
+    predictions = predict_durations(clients, timings, default=30)
+
+    assert predictions == {'fast': 3.0, 'slow': 520.0, 'new': 30}
+    assert [client['slug'] for client in longest_first(clients, predictions)] == ['slow', 'new', 'fast']
+
+
+def test_first_work_starts_even_when_predicted_over_the_budget():
+    deadline = make_deadline()
+
+    assert deadline.can_start(600)
+    # Once something has started, the budget applies again.
+    assert not deadline.can_start(600)
+    assert deadline.can_start(10)
+
+
+def test_work_that_no_longer_fits_is_not_started():
+    deadline = make_deadline(elapsed=400)
+
+    assert deadline.can_start(30)
+    assert not deadline.can_start(60)
+
+
+def test_slow_client_is_processed_on_a_fresh_invocation(monkeypatch):
+    monkeypatch.setattr(main, 'fetch_stage', lambda client, date_range, prefetched=None: ({}, {}, {}))
+    monkeypatch.setattr(main, 'render_stage', lambda *args: '<html></html>')
+    monkeypatch.setattr(main, 'publish_stage', lambda client, html, date_range, batch: 'https://reports/slow/')
+    gates = main.make_stage_gates(1)
+    deadline = make_deadline()
+    slow = {'name': 'Slow', 'slug': 'slow', 'customer_id': '1'}
+    other = {'name': 'Other', 'slug': 'other', 'customer_id': '2'}
+
+    result = main.process_client(slow, {}, gates, None, deadline=deadline, predicted_seconds=600)
+    deferred = main.process_client(other, {}, gates, None, deadline=deadline, predicted_seconds=600)
+
+    assert result['status'] == 'success'
+    assert deferred['status'] == 'deferred'
@@ -16,14 +16,15 @@ Example workflow:
 import os
 import sys
 import csv
-import json
-import subprocess
 import argparse
 from datetime import datetime, timedelta
 from pathlib import Path
 
+from publisher import GitHubApiPublisher, PublishManifest
+
 # Configuration
 REPO_DIR = Path.home() / "robert-hebert-media-reports"
+GITHUB_REPO = 'BLincoln711/robert-hebert-media-reports'
 CLIENTS = {
     "jftx2025": {"name": "JFTx2025", "customer_id": "917-597-4799"},
     "pfbhnc": {"name": "PFBHNC", "customer_id": "343-027-6201"},
@@ -126,7 +127,7 @@ REPORT_TEMPLATE = '''<!DOCTYPE html>
         <header class="report-header">
             <div class="header-top">
                 <div class="brand">Robert Hebert Media</div>
-                <div class="report-date">Report Generated: {generated_date}<br>Confidential</div>
+                <div class="report-date">Data Through: {data_through}<br>Confidential</div>
             </div>
             <h1 class="client-name">{client_name}</h1>
             <p class="report-title">Weekly Google Ads Performance Report</p>
@@ -427,8 +428,13 @@ def generate_executive_summary(client_name, data, prev_data):
     return " ".join(summary_parts) + "."
 
 
-def generate_report(client_slug, client_name, data, prev_data, date_range, prev_date_range, week_num):
-    """Generate HTML report for a client."""
+def generate_report(client_slug, client_name, data, prev_data, date_range, prev_date_range, end_date):
+    """
+    Generate HTML report for a client.
+
+    The output depends only on the inputs (dates come from `end_date`, the
+    last day of the period), so re-running a week reproduces the same file.
+    """
 
     # Calculate derived metrics
     data['ctr'] = (data['clicks'] / data['impressions'] * 100) if data['impressions'] > 0 else 0
@@ -452,11 +458,13 @@ def generate_report(client_slug, client_name, data, prev_data, date_range, prev_
     # Generate insights
     insights = generate_insights(data, prev_data)
 
+    iso_year, iso_week, _ = end_date.isocalendar()
+
     # Build report
     report = REPORT_TEMPLATE.format(
         client_name=client_name,
         date_range=date_range,
-        generated_date=datetime.now().strftime('%B %d, %Y'),
+        data_through=end_date.strftime('%B %d, %Y'),
         executive_summary=generate_executive_summary(client_name, data, prev_data),
 
         # Spend
@@ -509,7 +517,7 @@ def generate_report(client_slug, client_name, data, prev_data, date_range, prev_
 
         # Other
         insights_html=render_insights(insights),
-        report_id=f"RHM-{client_slug.upper()[:3]}-{datetime.now().year}-W{week_num:02d}"
+        report_id=f"RHM-{client_slug.upper()[:3]}-{iso_year}-W{iso_week:02d}"
     )
 
     return report
@@ -526,10 +534,10 @@ def get_folder_name(start_date, end_date):
     return f"{start_date.strftime('%b').lower()}{start_date.day}-{end_date.day}"
 
 
-def update_index_html(clients_data, date_range, folder_suffix):
-    """Update the main index.html with new report links."""
-
-    index_path = REPO_DIR / "index.html"
+def render_index_html(content, clients_data, date_range, folder_suffix):
+    """Return index.html `content` with the client sections linking the new reports."""
+    if content is None:
+        raise ValueError("index.html not found in the reports repo")
 
     # Generate client sections
     sections = []
@@ -556,19 +564,24 @@ def update_index_html(clients_data, date_range, folder_suffix):
             </div>
         </section>''')
 
-    # Read and update index
-    with open(index_path, 'r') as f:
-        content = f.read()
-
     # Find and replace client sections
     import re
     pattern = r'<!-- JFTx2025 -->.*?</section>\s*<!-- PFBHNC -->.*?</section>\s*<!-- ReOptica -->.*?</section>'
     replacement = '\n'.join(sections)
 
-    new_content = re.sub(pattern, replacement, content, flags=re.DOTALL)
+    return re.sub(pattern, replacement, content, flags=re.DOTALL)
+
+
+def update_index_html(clients_data, date_range, folder_suffix):
+    """Update the main index.html in the local repo with new report links."""
+
+    index_path = REPO_DIR / "index.html"
+
+    with open(index_path, 'r') as f:
+        content = f.read()
 
     with open(index_path, 'w') as f:
-        f.write(new_content)
+        f.write(render_index_html(content, clients_data, date_range, folder_suffix))
 
     print(f"Updated index.html")
 
@@ -650,26 +663,27 @@ def parse_csv(csv_path):
     return clients_data
 
 
-def deploy_to_github():
-    """Commit and push to GitHub."""
-    os.chdir(REPO_DIR)
-
-    # Add all changes
-    subprocess.run(['git', 'add', '-A'], check=True)
+def deploy_to_github(files, update_index):
+    """
+    Publish {repo path: content} to GitHub Pages as one commit through the
+    GitHub Git Data API, with index.html rewritten by `update_index` from
+    the branch head's copy. If another producer pushes first, the commit
+    and index are rebuilt on the new head. Needs GITHUB_TOKEN.
+    """
+    token = os.environ.get('GITHUB_TOKEN')
+    if not token:
+        sys.exit("Set GITHUB_TOKEN to deploy")
 
-    # Commit
     commit_msg = f"""Add weekly reports - {datetime.now().strftime('%B %d, %Y')}
 
 🤖 Generated with weekly_report.py
 
 Co-Authored-By: Claude Opus 4.5 <noreply@anthropic.com>"""
 
-    subprocess.run(['git', 'commit', '-m', commit_msg], check=True)
+    publisher = GitHubApiPublisher(GITHUB_REPO, lambda: token, manifest=PublishManifest())
+    published = publisher.publish(files, commit_msg, {'index.html': update_index})
 
-    # Push
-    subprocess.run(['git', 'push', 'origin', 'main'], check=True)
-
-    print("\n✓ Deployed to GitHub Pages")
+    print(f"\n✓ Deployed {len(published)} files to GitHub Pages ({len(files) + 1 - len(published)} unchanged)")
     print("  Reports will be live at: https://reports.roberthebertmedia.com/")
 
 
@@ -716,50 +730,56 @@ def main():
                 continue
 
         folder_suffix = get_folder_name(start_date, end_date)
-        week_num = end_date.isocalendar()[1]
     except Exception as e:
         print(f"Warning: Could not parse dates, using default naming. Error: {e}")
-        folder_suffix = datetime.now().strftime('%b%d').lower()
-        week_num = datetime.now().isocalendar()[1]
+        end_date = datetime.now()
+        folder_suffix = end_date.strftime('%b%d').lower()
 
     # Generate reports
     print("\n" + "="*60)
     print("GENERATING REPORTS")
     print("="*60)
 
+    # Repo path -> report HTML. With --deploy everything goes through the
+    # GitHub API and the local clone is left untouched.
+    files = {}
+
     for slug, data in clients_data.items():
         client_name = CLIENTS[slug]['name']
         print(f"\n  Generating report for {client_name}...")
 
-        # Create folder
-        folder_path = REPO_DIR / f"{slug}-{folder_suffix}"
-        folder_path.mkdir(exist_ok=True)
-
         # Generate report HTML
         html = generate_report(
             slug, client_name,
             data['current'], data['previous'],
             date_range, prev_date_range,
-            week_num
+            end_date
         )
 
-        # Write report
-        report_path = folder_path / "index.html"
-        with open(report_path, 'w') as f:
-            f.write(html)
+        files[f"{slug}-{folder_suffix}/index.html"] = html
 
-        print(f"    ✓ Saved: {report_path}")
+        if not args.deploy:
+            # Write report
+            folder_path = REPO_DIR / f"{slug}-{folder_suffix}"
+            folder_path.mkdir(exist_ok=True)
+            report_path = folder_path / "index.html"
+            with open(report_path, 'w') as f:
+                f.write(html)
+            print(f"    ✓ Saved: {report_path}")
 
-    # Update index
-    print("\n  Updating index.html...")
-    update_index_html(clients_data, date_range, folder_suffix)
-
-    # Deploy if requested
     if args.deploy:
+        # index.html is rebuilt from the remote copy, not the local clone's
         print("\n" + "="*60)
         print("DEPLOYING TO GITHUB")
         print("="*60)
-        deploy_to_github()
+        deploy_to_github(
+            files,
+            lambda content: render_index_html(content, clients_data, date_range, folder_suffix)
+        )
+    else:
+        # Update index
+        print("\n  Updating index.html...")
+        update_index_html(clients_data, date_range, folder_suffix)
 
     # Print summary
     print("\n" + "="*60)
@@ -16,7 +16,17 @@ echo "📊 Deploying report for $CLIENT_NAME..."
 # Commit and push
 git add -A
 git commit -m "Add $CLIENT_NAME report for $DATE_RANGE"
-git push
+
+# Retry the push, rebasing onto anything another producer pushed first
+for attempt in 1 2 3; do
+    git push && break
+    if [ "$attempt" -eq 3 ]; then
+        echo "❌ Push failed after $attempt attempts"
+        exit 1
+    fi
+    echo "⚠️  Push rejected, rebasing onto origin ($attempt/3)..."
+    git pull --rebase || exit 1
+done
 
 echo "✅ Report deployed!"
 echo "🔗 URL: https://reports.roberthebertmedia.com/$CLIENT_DIR/"